@@ -2,6 +2,8 @@ from __future__ import print_function, division
 import argparse
 import torch
 import os,sys
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from os import walk, listdir
 from os.path import isfile, join
 import numpy as np
@@ -65,105 +67,505 @@ parser.add_argument('--data_folder', type=str, default="./demo/demo_data/",
                     help='data in the folder')
 parser.add_argument('--save_folder', type=str, default="./demo/demo_results/",
                     help='results save folder')
-parser.add_argument('--files', type=str, default="test_motion.npy",
-                    help='files use')
-opt = parser.parse_args()
-print(opt)
-
-# ---load predefined something
-device = torch.device("cuda:" + str(opt.gpu_ids) if opt.cuda else "cpu")
-print(config.SMPL_MODEL_DIR)
-smplmodel = smplx.create(config.SMPL_MODEL_DIR, 
-                         model_type="smpl", gender="neutral", ext="pkl",
-                         batch_size=opt.batchSize).to(device)
-
-# ## --- load the mean pose as original ---- 
-smpl_mean_file = config.SMPL_MEAN_FILE
-
-file = h5py.File(smpl_mean_file, 'r')
-init_mean_pose = torch.from_numpy(file['pose'][:]).unsqueeze(0).float()
-init_mean_shape = torch.from_numpy(file['shape'][:]).unsqueeze(0).float()
-cam_trans_zero = torch.Tensor([0.0, 0.0, 0.0]).to(device)
+parser.add_argument('--files', type=str, nargs="+", default=["test_motion.npy"],
+                    help='files use, fitted one after the other')
+parser.add_argument('--window', type=int, default=0,
+                    help='frames fitted together as one batch, 0 fits frame by frame')
+parser.add_argument('--overlap', type=int, default=4,
+                    help='frames shared by neighbouring windows')
+parser.add_argument('--num_workers', type=int, default=1,
+                    help='cpu worker processes fitting the windows')
+parser.add_argument('--output_format', type=str, default="frames", choices=["frames", "sequence"],
+                    help='a ply and a pkl per frame, or a single sequence.npz')
+parser.add_argument('--init_params', type=str, default="",
+                    help='results of another fit of the same length (sequence.npz or folder of pkl) initialising every frame')
+parser.add_argument('--init_params_iters', type=int, default=0,
+                    help='smplify iters when --init_params is loaded, 0 keeps --num_smplify_iters')
+
+# ==============================
+# Batched fitting of frame windows
+# ==============================
+
+# With --window W the sequence is cut into windows of W frames, each window shares --overlap
+# frames with the next one and is optimised as a single batch of W frames:
 #
-pred_pose = torch.zeros(opt.batchSize, 72).to(device)
-pred_betas = torch.zeros(opt.batchSize, 10).to(device)
-pred_cam_t = torch.zeros(opt.batchSize, 3).to(device)
-keypoints_3d = torch.zeros(opt.batchSize, opt.num_joints, 3).to(device)
-
-# # #-------------initialize SMPLify
-smplify = SMPLify3D(smplxmodel=smplmodel,
-                    batch_size=opt.batchSize,
-                    joints_category=opt.joint_category,
-					num_iters=opt.num_smplify_iters,
-                    device=device)
-#print("initialize SMPLify3D done!")
-
-    
-purename = os.path.splitext(opt.files)[0]
-# --- load data ---
-data = np.load(opt.data_folder + "/" + purename + ".npy")
-
-dir_save = os.path.join(opt.save_folder, purename)
-if not os.path.isdir(dir_save):
-	os.makedirs(dir_save, exist_ok=True) 
-
-# run the whole seqs
-num_seqs = data.shape[0]
-
-for idx in range(num_seqs):
-	print(f"idx={idx}")
-
-	joints3d = data[idx] #*1.2 #scale problem [check first]	
-	keypoints_3d[0, :, :] = torch.Tensor(joints3d).to(device).float()
-
-	if idx == 0:
-		pred_betas[0, :] = init_mean_shape
-		pred_pose[0, :] = init_mean_pose
-		pred_cam_t[0, :] = cam_trans_zero
-	else:
-		data_param = joblib.load(dir_save + "/" + "%04d"%(idx-1) + ".pkl")
-		pred_betas[0, :] = torch.from_numpy(data_param['beta']).unsqueeze(0).float()
-		pred_pose[0, :] = torch.from_numpy(data_param['pose']).unsqueeze(0).float()
-		pred_cam_t[0, :] = torch.from_numpy(data_param['cam']).unsqueeze(0).float()
-		
-	if opt.joint_category =="AMASS":
-		confidence_input =  torch.ones(opt.num_joints)
+#   frames  0 ........ W
+#                  W-overlap ........ 2W-overlap
+#
+# A window is warm-started from the window before it: the shared frames start from their
+# fitted parameters, the new frames from the last fitted frame. The shared frames are then
+# refined by the later window. The windows are split into --num_workers contiguous runs fitted
+# by cpu worker processes; the first window of a run keeps none of its shared frames so the end
+# of the run before it is used there.
+#
+# Like the frame by frame fitting, frame 0 is fitted first from the mean pose, and only there is
+# the body shape optimised (seq_ind 0). Those betas are given to every window of every run and
+# stay fixed there (seq_ind is never 0), so the shape does not change from frame to frame or
+# between runs. The first window of every run starts from the pose of frame 0, its camera moved
+# along with the root joint, so the runs start close to the fit instead of from the mean pose.
+
+def load_mean_params():
+	file = h5py.File(config.SMPL_MEAN_FILE, 'r')
+	init_mean_pose = torch.from_numpy(file['pose'][:]).unsqueeze(0).float()
+	init_mean_shape = torch.from_numpy(file['shape'][:]).unsqueeze(0).float()
+	return init_mean_pose, init_mean_shape
+
+def load_fitter(batch_size, joint_category, num_iters, device):
+	smplmodel = smplx.create(config.SMPL_MODEL_DIR, 
+							 model_type="smpl", gender="neutral", ext="pkl",
+							 batch_size=batch_size).to(device)
+	smplify = SMPLify3D(smplxmodel=smplmodel,
+						batch_size=batch_size,
+						joints_category=joint_category,
+						num_iters=num_iters,
+						device=device)
+	return smplmodel, smplify
+
+def with_iters(fitter, num_iters):
+	# SMPLify3D reads num_iters on every call, so one fitter serves the cold and the warm-started fits
+	fitter[1].num_iters = num_iters
+	return fitter
+
+def joint_confidence(num_joints, joint_category, fix_foot):
+	if joint_category =="AMASS":
+		confidence_input =  torch.ones(num_joints)
 		# make sure the foot and ankle
-		if opt.fix_foot == True:
+		if fix_foot == True:
 			confidence_input[7] = 1.5
 			confidence_input[8] = 1.5
 			confidence_input[10] = 1.5
 			confidence_input[11] = 1.5
 	else:
 		print("Such category not settle down!")
-	  
-	# ----- from initial to fitting -------
+	return confidence_input
+
+# ==============================
+# Initialisation from another fit
+# ==============================
+
+# The variants of a weight sweep (e.g. wA=0.4 and wA=0.5 of the same video) have the same frames
+# and only differ slightly. With --init_params every frame starts from the fitted parameters of
+# the same frame of a neighbouring variant instead of the mean pose or the previous frame, so
+# fewer SMPLify iterations reach the same fit. seq_ind is never 0 then: SMPLify3D also optimises
+# the betas for seq_ind 0, while the warm-started frames keep the body shape of that fit fixed.
+
+def load_init_params(path, num_frames):
+	"""
+	(pose, betas, cam) arrays of every frame of a previous fit, None when it does not match num_frames.
+	"""
+	sequence_path = os.path.join(path, SEQUENCE_FILENAME) if os.path.isdir(path) else path
+
+	if os.path.exists(sequence_path):
+		sequence = np.load(sequence_path)
+		pose, betas, cam = sequence['pose'], sequence['beta'], sequence['cam']
+	else:
+		params = [joblib.load(os.path.join(path, "%04d"%idx + ".pkl")) for idx in range(num_frames)
+				  if os.path.exists(os.path.join(path, "%04d"%idx + ".pkl"))]
+		if not params:
+			print(f"no fitted parameters in {path}, starting from the mean pose")
+			return None
+		pose = np.concatenate([param['pose'] for param in params])
+		betas = np.concatenate([param['beta'] for param in params])
+		cam = np.concatenate([param['cam'] for param in params])
+
+	if pose.shape[0] != num_frames:
+		print(f"{path} has {pose.shape[0]} frames instead of {num_frames}, starting from the mean pose")
+		return None
+
+	return pose.astype(np.float32), betas.astype(np.float32), cam.astype(np.float32)
+
+def window_starts(num_frames, window, overlap):
+	step = window - overlap
+	starts = [0]
+	while starts[-1] + window < num_frames:
+		starts.append(starts[-1] + step)
+	return starts
+
+def fit_first_frame(fitter, data, window, init_mean_pose, init_mean_shape, confidence, device):
+	"""
+	Fit frame 0 from the mean pose and shape and return its (pose, betas, cam), its betas are the
+	body shape of the whole sequence.
+	"""
+	smplmodel, smplify = fitter
+
+	# every row of the batch holds frame 0, so the fitter of the windows is reused
+	keypoints_3d = torch.from_numpy(data[[0] * window]).float().to(device)
+
 	new_opt_vertices, new_opt_joints, new_opt_pose, new_opt_betas, \
 	new_opt_cam_t, new_opt_joint_loss = smplify(
-												pred_pose.detach(),
-												pred_betas.detach(),
-												pred_cam_t.detach(),
+												init_mean_pose.repeat(window, 1).to(device),
+												init_mean_shape.repeat(window, 1).to(device),
+												torch.zeros(window, 3).to(device),
 												keypoints_3d,
-												conf_3d=confidence_input.to(device),
-												seq_ind=idx
+												conf_3d=confidence.to(device),
+												seq_ind=0
 												)
 
+	return tuple(params[0].detach().cpu().numpy() for params in (new_opt_pose, new_opt_betas, new_opt_cam_t))
+
+def fit_windows(fitter, data, starts, window, keep_from, first_frame, confidence, init_params, device):
+	"""
+	Fit the windows beginning at starts one after the other, each warm-started from the one before,
+	or from init_params (pose, betas, cam of every frame) when given. The first window starts from
+	first_frame, the (pose, betas, cam) of frame 0, and every frame keeps its betas.
+	Returns {frame: (vertices, pose, betas, cam)} of the frames from keep_from on.
+	"""
+	smplmodel, smplify = fitter
+	num_seqs = data.shape[0]
+	fitted = {}
+	previous = None
+	first_pose, shared_betas, first_cam = first_frame
+
+	for start in starts:
+		# the last window is padded with the last frame so every batch has the same size
+		frames = np.minimum(np.arange(start, start + window), num_seqs - 1)
+		num_valid = min(window, num_seqs - start)
+		print(f"window {start}-{start + num_valid - 1}")
+
+		keypoints_3d = torch.from_numpy(data[frames]).float().to(device)
+
+		if init_params is not None:
+			pred_pose = torch.from_numpy(init_params[0][frames])
+			pred_cam_t = torch.from_numpy(init_params[2][frames])
+		elif previous is None:
+			# the pose of frame 0, with the camera following the root joint from frame 0
+			pred_pose = torch.from_numpy(first_pose).unsqueeze(0).repeat(window, 1)
+			pred_cam_t = torch.from_numpy(first_cam + data[frames, 0] - data[0, 0])
+		else:
+			# position of every frame in the previous window, frames past its end start from its last frame
+			previous_start, previous_pose, previous_cam = previous
+			positions = np.minimum(frames - previous_start, window - 1)
+			pred_pose = torch.from_numpy(previous_pose[positions])
+			pred_cam_t = torch.from_numpy(previous_cam[positions])
+
+		# the shape fitted on frame 0, kept fixed since seq_ind is never 0
+		pred_betas = torch.from_numpy(shared_betas).float().unsqueeze(0).repeat(window, 1)
+		seq_ind = start + 1
+
+		# ----- from initial to fitting -------
+		new_opt_vertices, new_opt_joints, new_opt_pose, new_opt_betas, \
+		new_opt_cam_t, new_opt_joint_loss = smplify(
+													pred_pose.float().to(device),
+													pred_betas.float().to(device),
+													pred_cam_t.float().to(device),
+													keypoints_3d,
+													conf_3d=confidence.to(device),
+													seq_ind=seq_ind
+													)
+
+		outputp = smplmodel(betas=new_opt_betas, global_orient=new_opt_pose[:, :3], body_pose=new_opt_pose[:, 3:],
+							transl=new_opt_cam_t, return_verts=True)
+
+		vertices = outputp.vertices.detach().cpu().numpy()
+		pose = new_opt_pose.detach().cpu().numpy()
+		betas = new_opt_betas.detach().cpu().numpy()
+		cam = new_opt_cam_t.detach().cpu().numpy()
+
+		for i in range(num_valid):
+			if start + i >= keep_from:
+				fitted[start + i] = (vertices[i], pose[i], betas[i], cam[i])
+
+		previous = (start, pose, cam)
+		keep_from = start
+
+	return fitted
+
+# fitter of a worker process, loaded once by init_window_worker
+worker_fitter = None
+
+def init_window_worker(window, joint_category, num_threads):
+	global worker_fitter
+	torch.set_num_threads(num_threads)
+	# the iterations are set by every job
+	worker_fitter = load_fitter(window, joint_category, parser.get_default("num_smplify_iters"), torch.device("cpu"))
+
+def fit_windows_worker(args):
+	num_iters, args = args
+	return fit_windows(with_iters(worker_fitter, num_iters), *args, device=torch.device("cpu"))
+
+def fit_first_frame_worker(args):
+	num_iters, args = args
+	return fit_first_frame(with_iters(worker_fitter, num_iters), *args, device=torch.device("cpu"))
+
+def window_pool(num_workers, window, joint_category):
+	"""
+	Worker processes each holding a fitter of window frames, for fit_sequence_windows.
+	The iteration count is sent with every job, so the pool serves any --num_smplify_iters.
+	"""
+	num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+	# spawned workers do not inherit the torch thread pools of this process
+	context = multiprocessing.get_context("spawn")
+	return context.Pool(num_workers, initializer=init_window_worker,
+						initargs=(window, joint_category, num_threads))
+
+def fit_sequence_windows(data, opt, device, init_mean_pose, init_mean_shape, confidence_input, fitter=None, init_params=None,
+						 pool=None):
+	"""
+	Fit the whole sequence by windows of opt.window frames, returns {frame: (vertices, pose, betas, cam)}.
+	fitter is the model of opt.window frames used without worker processes, loaded when not given.
+	pool is a window_pool of at least opt.num_workers workers kept by the caller, one is started
+	for this sequence only when not given.
+	"""
+	if not 0 <= opt.overlap < opt.window:
+		raise ValueError(f"--overlap must be between 0 and --window - 1, got {opt.overlap}")
+
+	starts = window_starts(data.shape[0], opt.window, opt.overlap)
+	num_workers = max(1, min(opt.num_workers, len(starts)))
+
+	# contiguous runs of windows, a run keeps its frames from the end of the overlap with the run before
+	runs = [list(run) for run in np.array_split(starts, num_workers)]
+
+	def run_jobs(first_frame):
+		return [(data, run, opt.window, run[0] + opt.overlap if run[0] > 0 else 0,
+				 first_frame, confidence_input, init_params) for run in runs]
+
+	# frame 0 is fitted first, or taken from the fit the sequence is initialised from
+	first_frame_job = (data, opt.window, init_mean_pose, init_mean_shape, confidence_input)
+	init_first_frame = tuple(params[0] for params in init_params) if init_params is not None else None
+
+	if num_workers == 1:
+		fitter = fitter or load_fitter(opt.window, opt.joint_category, opt.num_smplify_iters, device)
+		first_frame = init_first_frame or fit_first_frame(fitter, *first_frame_job, device=device)
+		return fit_windows(fitter, *run_jobs(first_frame)[0], device=device)
+
+	print(f"fitting {len(starts)} windows on {num_workers} worker processes")
+	own_pool = pool is None
+	if own_pool:
+		pool = window_pool(num_workers, opt.window, opt.joint_category)
+
+	try:
+		first_frame = init_first_frame or pool.apply(fit_first_frame_worker, ((opt.num_smplify_iters, first_frame_job),))
+
+		fitted = {}
+		jobs = [(opt.num_smplify_iters, job) for job in run_jobs(first_frame)]
+		for run_fitted in pool.map(fit_windows_worker, jobs):
+			fitted.update(run_fitted)
+	finally:
+		if own_pool:
+			pool.terminate()
+
+	return fitted
+
+def fit_sequence_frames(fitter, data, opt, device, init_mean_pose, init_mean_shape, confidence_input, init_params=None):
+	"""
+	Fit the sequence one frame at a time, each frame warm-started from the one before,
+	or from init_params (pose, betas, cam of every frame) when given.
+	Yields (idx, (vertices, pose, betas, cam)) as the frames are fitted.
+	"""
+	smplmodel, smplify = fitter
+
+	cam_trans_zero = torch.Tensor([0.0, 0.0, 0.0]).to(device)
+	#
+	pred_pose = torch.zeros(opt.batchSize, 72).to(device)
+	pred_betas = torch.zeros(opt.batchSize, 10).to(device)
+	pred_cam_t = torch.zeros(opt.batchSize, 3).to(device)
+	keypoints_3d = torch.zeros(opt.batchSize, opt.num_joints, 3).to(device)
+
+	for idx in range(data.shape[0]):
+		print(f"idx={idx}")
+
+		joints3d = data[idx] #*1.2 #scale problem [check first]	
+		keypoints_3d[0, :, :] = torch.Tensor(joints3d).to(device).float()
+
+		if init_params is not None:
+			pred_pose[0, :] = torch.from_numpy(init_params[0][idx])
+			pred_betas[0, :] = torch.from_numpy(init_params[1][idx])
+			pred_cam_t[0, :] = torch.from_numpy(init_params[2][idx])
+		elif idx == 0:
+			pred_betas[0, :] = init_mean_shape
+			pred_pose[0, :] = init_mean_pose
+			pred_cam_t[0, :] = cam_trans_zero
+		else:
+			# warm start from the previous frame's fit, the same values its pkl holds
+			pred_betas[0, :] = new_opt_betas[0].detach()
+			pred_pose[0, :] = new_opt_pose[0].detach()
+			pred_cam_t[0, :] = new_opt_cam_t[0].detach()
+		  
+		# ----- from initial to fitting -------
+		new_opt_vertices, new_opt_joints, new_opt_pose, new_opt_betas, \
+		new_opt_cam_t, new_opt_joint_loss = smplify(
+													pred_pose.detach(),
+													pred_betas.detach(),
+													pred_cam_t.detach(),
+													keypoints_3d,
+													conf_3d=confidence_input.to(device),
+													seq_ind=idx if init_params is None else idx + 1
+													)
+
+		outputp = smplmodel(betas=new_opt_betas, global_orient=new_opt_pose[:, :3], body_pose=new_opt_pose[:, 3:],
+							transl=new_opt_cam_t, return_verts=True)
+
+		yield idx, (outputp.vertices.detach().cpu().numpy()[0], new_opt_pose.detach().cpu().numpy()[0],
+					new_opt_betas.detach().cpu().numpy()[0], new_opt_cam_t.detach().cpu().numpy()[0])
+
+# ==============================
+# Single file output of a sequence
+# ==============================
+
+# With --output_format sequence the whole fit is written to <save_folder>/<name>/sequence.npz
+# instead of a ply and a pkl per frame:
+#
+#   vertices  (T, 6890, 3) float32
+#   faces     (F, 3)       the SMPL faces, stored once
+#   pose      (T, 72), beta (T, 10), cam (T, 3), root (T, 3)
+#
+# The archive is not compressed, so the vertices can be memory mapped straight from it
+# (see load_sequence_vertices in animation_pose.py); np.load reads it as any other npz.
+
+SEQUENCE_FILENAME = "sequence.npz"
+
+def save_sequence(dir_save, faces, vertices, pose, betas, cam, root):
+	temp_path = os.path.join(dir_save, SEQUENCE_FILENAME + ".tmp")
+	with open(temp_path, "wb") as file:
+		np.savez(file, vertices=vertices, faces=np.asarray(faces, dtype=np.int32),
+				 pose=pose, beta=betas, cam=cam, root=root)
+	os.replace(temp_path, os.path.join(dir_save, SEQUENCE_FILENAME))
+
+def save_frame(dir_save, idx, faces, vertices, pose, betas, cam, root_position):
 	# # -- save the results to ply---
-	outputp = smplmodel(betas=new_opt_betas, global_orient=new_opt_pose[:, :3], body_pose=new_opt_pose[:, 3:],
-						transl=new_opt_cam_t, return_verts=True)
-	mesh_p = trimesh.Trimesh(vertices=outputp.vertices.detach().cpu().numpy().squeeze(), faces=smplmodel.faces, process=False)
+	mesh_p = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
 	mesh_p.export(dir_save + "/" + "%04d"%idx + ".ply")
 	
 	# save the pkl
 	param = {}
-	param['beta'] = new_opt_betas.detach().cpu().numpy()
-	param['pose'] = new_opt_pose.detach().cpu().numpy()
-	param['cam'] = new_opt_cam_t.detach().cpu().numpy()
+	param['beta'] = betas
+	param['pose'] = pose
+	param['cam'] = cam
 	
 	# save the root position
-	# shape of keypoints_3d is torch.Size([1, 22, 3]) and root is the first one
-	root_position = keypoints_3d[0, 0, :].detach().cpu().numpy()
-	print(f"root at {root_position}, shape of keypoints_3d is {keypoints_3d.shape}")
 	param['root'] = root_position
 	
 	joblib.dump(param, dir_save + "/" + "%04d"%idx + ".pkl", compress=3)
+
+# ==============================
+# Fitting many sequences with one process
+# ==============================
+
+# Importing torch/smplx, building the SMPL model and SMPLify3D and reading the mean pose take
+# longer than fitting a short sequence with few iterations. A FittingSession does them once and
+# then fits any number of sequences, from a list of --files or from another process:
+#
+#   session = FittingSession(parser.parse_args([]))
+#   session.fit_file("clip.npy", save_folder="/renders", output_format="sequence")
+
+class FittingSession:
+	"""
+	The mean pose, faces and fitters (one per batch size, any iteration count) loaded once,
+	and the worker processes of the windowed fitting, started on first use. close() stops them.
+
+	Args:
+		opt (argparse.Namespace): Parsed options, the defaults of every fit_file call.
+	"""
+
+	def __init__(self, opt):
+		self.opt = opt
+
+		# ---load predefined something
+		self.device = torch.device("cuda:" + str(opt.gpu_ids) if opt.cuda else "cpu")
+		print(config.SMPL_MODEL_DIR)
+
+		# ## --- load the mean pose as original ---- 
+		self.init_mean_pose, self.init_mean_shape = load_mean_params()
+		self.confidence_input = joint_confidence(opt.num_joints, opt.joint_category, opt.fix_foot)
+		self.faces = smplx.create(config.SMPL_MODEL_DIR, model_type="smpl", gender="neutral", ext="pkl").faces
+		self.fitters = {}
+		self.pools = {}
+
+	def fitter(self, batch_size, num_iters):
+		if batch_size not in self.fitters:
+			# # #-------------initialize SMPLify
+			self.fitters[batch_size] = load_fitter(batch_size, self.opt.joint_category, num_iters, self.device)
+		return with_iters(self.fitters[batch_size], num_iters)
+
+	def window_pool(self, window, num_workers):
+		# the workers rebuild SMPL and SMPLify3D when started, so they are kept for the next sequences
+		key = (window, num_workers)
+		if key not in self.pools:
+			self.pools[key] = window_pool(num_workers, window, self.opt.joint_category)
+		return self.pools[key]
+
+	def close(self):
+		for pool in self.pools.values():
+			pool.close()
+			pool.join()
+		self.pools = {}
+
+	def fit_file(self, file_name, **options):
+		"""
+		Fit one .npy sequence of the data folder and return the folder its results are written to.
+		options override the session options for this sequence (e.g. save_folder, output_format).
+		"""
+		opt = argparse.Namespace(**{**vars(self.opt), **options})
+
+		purename = os.path.splitext(file_name)[0]
+		# --- load data ---
+		data = np.load(opt.data_folder + "/" + purename + ".npy")
+
+		dir_save = os.path.join(opt.save_folder, purename)
+		if not os.path.isdir(dir_save):
+			os.makedirs(dir_save, exist_ok=True) 
+
+		init_params = load_init_params(opt.init_params, data.shape[0]) if opt.init_params else None
+
+		# fewer iterations only when the other fit was actually loaded, a cold start keeps them all
+		if init_params is not None and opt.init_params_iters > 0:
+			opt.num_smplify_iters = opt.init_params_iters
+
+		if opt.window > 1:
+			if opt.num_workers <= 1:
+				fitter, pool = self.fitter(opt.window, opt.num_smplify_iters), None
+			else:
+				fitter, pool = None, self.window_pool(opt.window, opt.num_workers)
+			fitted = sorted(fit_sequence_windows(data, opt, self.device, self.init_mean_pose, self.init_mean_shape,
+												 self.confidence_input, fitter=fitter, init_params=init_params,
+												 pool=pool).items())
+		else:
+			fitter = self.fitter(opt.batchSize, opt.num_smplify_iters)
+			fitted = fit_sequence_frames(fitter, data, opt, self.device, self.init_mean_pose, self.init_mean_shape,
+										 self.confidence_input, init_params=init_params)
+
+		# root position of every frame, the first joint
+		roots = data[:, 0, :].astype(np.float32)
+
+		if opt.output_format == "sequence":
+			num_seqs = data.shape[0]
+			vertices = np.zeros((num_seqs, 6890, 3), dtype=np.float32)
+			pose = np.zeros((num_seqs, 72), dtype=np.float32)
+			betas = np.zeros((num_seqs, 10), dtype=np.float32)
+			cam = np.zeros((num_seqs, 3), dtype=np.float32)
+
+			for idx, frame in fitted:
+				vertices[idx], pose[idx], betas[idx], cam[idx] = frame
+
+			save_sequence(dir_save, self.faces, vertices, pose, betas, cam, roots)
+			return dir_save
+
+		# the ply and pkl files are written by a background thread while the next frames are fitted,
+		# the fitting itself never reads them back
+		with ThreadPoolExecutor(max_workers=1) as writer:
+			saved = []
+			for idx, (vertices, pose, betas, cam) in fitted:
+				# same shapes as the frame by frame fitting, a batch of one
+				saved.append(writer.submit(save_frame, dir_save, idx, self.faces, vertices, pose[None], betas[None],
+										   cam[None], roots[idx]))
+
+			# raising the first error of a write, if any
+			for future in saved:
+				future.result()
+
+		return dir_save
+
+def main():
+	opt = parser.parse_args()
+	print(opt)
+
+	session = FittingSession(opt)
+	try:
+		for file_name in opt.files:
+			session.fit_file(file_name)
+	finally:
+		session.close()
+
+if __name__ == "__main__":
+	main()
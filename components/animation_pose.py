@@ -2,10 +2,13 @@ import bpy
 import os
 import math
 import sys
+import struct
+import zipfile
 import mathutils
+import numpy as np
 
 # To run the python file using CLI (Blender 3.0.1)
-# ./blender -b -P animation_pose.py -- --name <name of folder containing .ply>
+# ./blender -b -P animation_pose.py -- --name <name of folder containing .ply or sequence.npz>
 
 # Enable script auto-execution in Blender preferences
 bpy.context.preferences.filepaths.use_scripts_auto_execute = True
@@ -50,6 +53,65 @@ def import_ply_files(directory):
             except RuntimeError as err:
                 print(f"Error importing {file_path}: {err}")
 
+# Name of the single file output of fit_seq.py --output_format sequence
+SEQUENCE_FILENAME = "sequence.npz"
+
+def load_sequence_vertices(sequence_path):
+    """
+    Memory maps the (T, 6890, 3) vertices of a sequence.npz without reading the whole file.
+    The archive is written uncompressed, so the array is stored as-is inside it.
+    """
+    with zipfile.ZipFile(sequence_path) as archive:
+        info = archive.getinfo("vertices.npy")
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        return np.load(sequence_path)["vertices"]
+
+    with open(sequence_path, "rb") as file:
+        # skipping the local file header (30 bytes, then the name and the extra field) of the member
+        file.seek(info.header_offset)
+        name_length, extra_length = struct.unpack("<HH", file.read(30)[26:30])
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+
+    return np.memmap(sequence_path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+def import_sequence_file(sequence_path):
+    """
+    Builds the '0000' object from the first frame of a sequence.npz and adds every
+    other frame as a 'Frame_XXXX' shape key, the result of import_ply_files
+    followed by create_shape_keys_for_frames.
+    """
+    vertices = load_sequence_vertices(sequence_path)
+    faces = np.load(sequence_path)["faces"]
+
+    mesh = bpy.data.meshes.new("0000")
+    mesh.from_pydata(vertices[0].tolist(), [], faces.tolist())
+    mesh.update()
+
+    main_obj = bpy.data.objects.new("0000", mesh)
+    bpy.data.collections["Collection"].objects.link(main_obj)
+
+    # Same placement as the imported .ply files
+    main_obj.rotation_euler = (0, 0, 0)
+    main_obj.rotation_euler[0] = math.radians(-90)  # turn upright
+    main_obj.rotation_euler[2] = math.radians(180)
+    main_obj.location.z += 1
+
+    main_obj.shape_key_add(name="Basis", from_mix=False)
+    for frame in range(1, vertices.shape[0]):
+        sk = main_obj.shape_key_add(name=f"Frame_{frame:04d}", from_mix=False)
+        sk.data.foreach_set("co", np.ascontiguousarray(vertices[frame], dtype=np.float32).ravel())
+
+    print("Imported", vertices.shape[0], "frames from", sequence_path)
+
 def create_shape_keys_for_frames():
     """
     Finds all objects named with integer numbers (e.g. '0000', '0001', '0002', ...).
@@ -416,8 +478,12 @@ def main():
     # Folder location
     directory = f"./{folder_name}/{name}/"
 
-    # Calling the function
-    import_ply_files(directory)
+    # Calling the function, a single sequence file replaces the .ply files when present
+    sequence_path = os.path.join(directory, SEQUENCE_FILENAME)
+    if os.path.exists(sequence_path):
+        import_sequence_file(sequence_path)
+    else:
+        import_ply_files(directory)
     create_shape_keys_for_frames()
     animate_shape_keys()
     remove_extra_objects()
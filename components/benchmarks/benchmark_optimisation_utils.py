@@ -0,0 +1,174 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from optimisation.optimisation_utils import (map_h36m_to_smpl, upsample_pose_data, resample_pose_data,
+                                             center_and_rotate_smpl, normalize_pose_data,
+                                             compute_P_opt, compute_P_opt_batch, WEIGHT_PAIRS)
+
+# ==============================
+# Micro-benchmarks of optimisation_utils on synthetic pose data
+# ==============================
+
+# run from the components folder:
+# python benchmarks/benchmark_optimisation_utils.py --output bench_results.json
+# python benchmarks/benchmark_optimisation_utils.py --output new.json --compare bench_results.json
+
+REFERENCE_FOLDER = Path(__file__).resolve().parents[1] / "dataset/data_manipulation/test_video_1"
+
+def synthetic_poses(rng, leading_shape, num_joints):
+    """
+    Random-walk joint trajectories of shape leading_shape + (num_joints, 3), float32 like the model outputs.
+    """
+    steps = rng.normal(scale=0.01, size=leading_shape + (num_joints, 3))
+    return np.cumsum(steps, axis=-3).astype(np.float32)
+
+def measure(function, repeats):
+    """
+    Time function over several runs and record the peak memory allocated by one run.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"min_s": min(times), "median_s": float(np.median(times)), "peak_bytes": peak}
+
+def benchmark_cases(frame_counts, batch_sizes, seed=0):
+    """
+    Yield (name, params, function) for every benchmarked call.
+    """
+    rng = np.random.default_rng(seed)
+
+    for T in frame_counts:
+        h36m = synthetic_poses(rng, (T,), 17)
+        smpl = synthetic_poses(rng, (T,), 22).astype(np.float64)
+        smpl_other = synthetic_poses(rng, (T,), 22).astype(np.float64)
+
+        yield "map_h36m_to_smpl", {"T": T, "N": 1}, lambda: map_h36m_to_smpl(h36m)
+        yield "upsample_pose_data", {"T": T, "N": 1}, lambda: upsample_pose_data(smpl, int(T * 1.5))
+        yield "center_and_rotate_smpl", {"T": T, "N": 1}, lambda: center_and_rotate_smpl(smpl)
+        yield "compute_P_opt_batch", {"T": T, "N": 1, "W": len(WEIGHT_PAIRS)}, lambda: compute_P_opt_batch(smpl, smpl_other, 0.5, WEIGHT_PAIRS)
+
+        for N in batch_sizes:
+            h36m_batch = synthetic_poses(rng, (N, T), 17)
+            smpl_batch = synthetic_poses(rng, (N, T), 22)
+
+            yield "map_h36m_to_smpl", {"T": T, "N": N}, lambda: map_h36m_to_smpl(h36m_batch)
+            yield "resample_pose_data", {"T": T, "N": N}, lambda: resample_pose_data(smpl_batch, int(T * 1.5))
+            yield "normalize_pose_data", {"T": T, "N": N}, lambda: normalize_pose_data(smpl_batch)
+
+def validate_reference(reference_folder=REFERENCE_FOLDER, tolerance=1e-6):
+    """
+    Compare the functions against the checked-in test_video_1 artifacts.
+    """
+    reference_folder = Path(reference_folder)
+    checks = []
+
+    def check(name, result, expected_path):
+        error = float(np.abs(result - np.load(expected_path)).max())
+        checks.append({"name": name, "max_abs_error": error, "passed": error <= tolerance})
+
+    real = map_h36m_to_smpl(reference_folder / "output_keypoints_3d.npz")
+    check("map_h36m_to_smpl", real, reference_folder / "output_keypoints_3d.npy")
+
+    flipped = center_and_rotate_smpl(reference_folder / "gen_motion_00_L108_00_a.npy")
+    check("center_and_rotate_smpl", flipped, reference_folder / "gen_motion_00_L108_00_a_flip.npy")
+
+    extended = upsample_pose_data(flipped, target_frames=real.shape[0])
+    check("upsample_pose_data", extended, reference_folder / "gen_motion_00_L108_00_a_flip_extended.npy")
+
+    variants = compute_P_opt_batch(real, extended, 0.5, WEIGHT_PAIRS)
+    for (w_A, w_B), P_opt in zip(WEIGHT_PAIRS, variants):
+        check(f"compute_P_opt_batch wA{w_A}_wB{w_B}", P_opt, reference_folder / f"all_variations/_euclidean_distances_wA{w_A}_wB{w_B}.npy")
+
+    single = compute_P_opt(reference_folder / "output_keypoints_3d.npy",
+                           reference_folder / "gen_motion_00_L108_00_a_flip_extended.npy", 0.5, 0.5, 0.5)
+    check("compute_P_opt wA0.5_wB0.5", single, reference_folder / "all_variations/_euclidean_distances_wA0.5_wB0.5.npy")
+
+    return checks
+
+def compare_results(current, previous_path, threshold):
+    """
+    Print the timing ratio to a previous results file and return the cases slower than threshold.
+    """
+    with open(previous_path, "r", encoding="utf-8") as file:
+        previous = {(result["name"], json.dumps(result["params"], sort_keys=True)): result for result in json.load(file)["results"]}
+
+    regressions = []
+    for result in current["results"]:
+        old = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is None:
+            continue
+
+        ratio = result["min_s"] / old["min_s"] if old["min_s"] > 0 else float("inf")
+        print(f"{result['name']:<24} {json.dumps(result['params']):<32} {ratio:6.2f}x")
+        if ratio > threshold:
+            regressions.append({**result, "ratio": ratio})
+
+    return regressions
+
+def run(frame_counts, batch_sizes, repeats):
+    results = []
+
+    for name, params, function in benchmark_cases(frame_counts, batch_sizes):
+        result = {"name": name, "params": params, **measure(function, repeats)}
+        print(f"{name:<24} {json.dumps(params):<32} {result['min_s'] * 1e3:10.3f} ms {result['peak_bytes'] / 2**20:10.2f} MiB")
+        results.append(result)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeats": repeats,
+        },
+        "validation": validate_reference(),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, nargs="+", default=[100, 1000, 10000],
+                        help='sequence lengths T')
+    parser.add_argument('--batch_sizes', type=int, nargs="+", default=[16, 128],
+                        help='number of sequences N for the batched calls')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='timed runs per case')
+    parser.add_argument('--output', type=str, default="bench_results.json",
+                        help='json file the results are written to')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression')
+    opt = parser.parse_args()
+
+    report = run(opt.frames, opt.batch_sizes, opt.repeats)
+
+    with open(opt.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    failed = [check for check in report["validation"] if not check["passed"]]
+    for check in failed:
+        print(f"🚨 ERROR: {check['name']} differs from the reference by {check['max_abs_error']}")
+
+    regressions = compare_results(report, opt.compare, opt.threshold) if opt.compare else []
+    for regression in regressions:
+        print(f"🚨 Regression: {regression['name']} {regression['params']} is {regression['ratio']:.2f}x slower")
+
+    sys.exit(1 if failed or regressions else 0)
@@ -0,0 +1,166 @@
+import argparse
+import csv
+import json
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from .optimisation_utils import WEIGHT_PAIRS
+from .optimisation_real_synth import main_synth_real
+from .optimisation_both_real import main_real_real
+
+# Runs the optimisation stage (mapping, alignment and variant generation) for many videos at once.
+# A job is a dict with:
+#   real_npz  - StridedTransformer .npz of the (first) real video
+#   second    - text-to-motion .npy (real2synth) or the .npz of the second real video (real2real)
+#   folder    - the video's folder in the dataset, where all_variations is written
+
+# run from the components folder:
+# python -m optimisation.batch_optimisation --manifest jobs.csv --workers 16 --report report.json
+
+MANIFEST_FIELDS = ["real_npz", "second", "folder"]
+
+def load_manifest(manifest_path):
+    """
+    Read jobs from a .csv file with real_npz, second and folder columns, or from a .json list of job dicts.
+    """
+    manifest_path = Path(manifest_path)
+
+    if manifest_path.suffix == ".json":
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            jobs = json.load(file)
+    else:
+        with open(manifest_path, "r", encoding="utf-8", newline="") as file:
+            jobs = list(csv.DictReader(file))
+
+    for job in jobs:
+        missing = [field for field in MANIFEST_FIELDS if not job.get(field)]
+        if missing:
+            raise ValueError(f"Manifest job {job} is missing {missing}")
+
+    return jobs
+
+def discover_jobs(dataset_directory):
+    """
+    Build jobs from a dataset already produced by the pipelines, e.g. to re-optimise it with a new alpha.
+
+    real2synth folders hold output_keypoints_3d.npz and the text-to-motion gen_motion_*.npy,
+    real2real folders (named <video_1>_<video_2>) hold output_keypoints_3d_<video>.npz for both videos.
+    """
+    jobs = []
+
+    for folder in sorted(Path(dataset_directory).iterdir()):
+        if not folder.is_dir():
+            continue
+
+        real_npz = folder / "output_keypoints_3d.npz"
+        if real_npz.exists():
+            synthetic = [path for path in sorted(folder.glob("gen_motion_*.npy")) if not path.stem.endswith(("_flip", "_extended"))]
+            if synthetic:
+                jobs.append({"real_npz": str(real_npz), "second": str(synthetic[-1]), "folder": str(folder)})
+            continue
+
+        pair_npz = sorted(folder.glob("output_keypoints_3d_*.npz"))
+        if len(pair_npz) == 2:
+            # the first video of the pair is the one the folder name starts with
+            video_names = [path.stem.replace("output_keypoints_3d_", "", 1) for path in pair_npz]
+            if not folder.name.startswith(video_names[0] + "_"):
+                pair_npz.reverse()
+            jobs.append({"real_npz": str(pair_npz[0]), "second": str(pair_npz[1]), "folder": str(folder)})
+
+    return jobs
+
+def run_job(job, weights=WEIGHT_PAIRS, alpha=0.5, archive=True, save_intermediates=False):
+    """
+    Run one optimisation job and return its report, errors are recorded instead of raised.
+    """
+    report = {"folder": job["folder"], "status": "ok", "error": None}
+
+    try:
+        # the entry points build their file names by appending to the folder string
+        folder_path = str(job["folder"])
+        os.makedirs(folder_path, exist_ok=True)
+
+        if str(job["second"]).endswith(".npz"):
+            main_real_real(str(job["real_npz"]), str(job["second"]), folder_path,
+                           save_intermediates=save_intermediates, weights=weights, alpha=alpha, archive=archive)
+        else:
+            main_synth_real(str(job["real_npz"]), str(job["second"]), folder_path,
+                            save_intermediates=save_intermediates, weights=weights, alpha=alpha, archive=archive)
+
+    except Exception as e:
+        report["status"] = "error"
+        report["error"] = f"{type(e).__name__}: {e}"
+        report["traceback"] = traceback.format_exc()
+
+    return report
+
+def run_batch(jobs, weights=WEIGHT_PAIRS, alpha=0.5, num_workers=None, chunksize=4, archive=True, save_intermediates=False):
+    """
+    Run optimisation jobs across a process pool.
+
+    Args:
+        jobs (list): Job dicts, see load_manifest and discover_jobs.
+        weights (list): w_A values or (w_A, w_B) pairs written for every job.
+        alpha (float): Scaling factor for P_opt.
+        num_workers (int, optional): Number of worker processes, defaults to the CPU count.
+        chunksize (int): Number of jobs sent to a worker at a time.
+        archive (bool): Write the variants to a VariantArchive instead of one .npy per weight.
+        save_intermediates (bool): Also write the mapped, flipped and extended arrays.
+
+    Returns:
+        list: One report per job, in the order of jobs, with status "ok" or "error".
+    """
+    worker = partial(run_job, weights=weights, alpha=alpha, archive=archive, save_intermediates=save_intermediates)
+
+    # running in-process avoids the pool start-up cost for a single worker
+    if num_workers == 1:
+        reports = [worker(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            reports = list(executor.map(worker, jobs, chunksize=chunksize))
+
+    failed = [report for report in reports if report["status"] != "ok"]
+    print(f"Log: Batch optimisation finished, {len(reports) - len(failed)} succeeded and {len(failed)} failed")
+
+    return reports
+
+def write_report(reports, report_path):
+    with open(report_path, "w", encoding="utf-8") as file:
+        json.dump(reports, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='csv or json manifest of jobs')
+    parser.add_argument('--dataset', type=str, default=None,
+                        help='existing dataset folder to re-optimise when no manifest is given')
+    parser.add_argument('--weights', type=float, nargs="+", default=[w_A for w_A, _ in WEIGHT_PAIRS],
+                        help='w_A values to generate')
+    parser.add_argument('--alpha', type=float, default=0.5,
+                        help='scaling factor of P_opt')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=4,
+                        help='jobs sent to a worker at a time')
+    parser.add_argument('--no_archive', action='store_true',
+                        help='write one .npy file per weight instead of the variants archive')
+    parser.add_argument('--save_intermediates', action='store_true',
+                        help='also write the mapped, flipped and extended arrays')
+    parser.add_argument('--report', type=str, default="batch_optimisation_report.json",
+                        help='where to write the per-job report')
+    opt = parser.parse_args()
+
+    if opt.manifest:
+        batch_jobs = load_manifest(opt.manifest)
+    elif opt.dataset:
+        batch_jobs = discover_jobs(opt.dataset)
+    else:
+        parser.error("either --manifest or --dataset is required")
+
+    batch_reports = run_batch(batch_jobs, weights=opt.weights, alpha=opt.alpha, num_workers=opt.workers,
+                              chunksize=opt.chunksize, archive=not opt.no_archive,
+                              save_intermediates=opt.save_intermediates)
+    write_report(batch_reports, opt.report)
@@ -1,13 +1,19 @@
 import numpy as np
 from scipy.interpolate import interp1d
 from pathlib import Path
-from .optimisation_utils import map_h36m_to_smpl, upsample_pose_data, compute_P_opt
+from .optimisation_utils import map_h36m_to_smpl, upsample_pose_data, WEIGHT_PAIRS
+from .variant_store import PoseVariantStore
 
 # real_path_npz_1 refers to the First Generated Tracked-Motion Data
 # real_path_npz_2 refers to the Second Generated Tracked-Motion Data
 
 # used when one is real and another is real too
-def main_real_real(real_path_npz_1, real_path_npz_2, folder_path):
+# the arrays are passed between the steps in memory, set save_intermediates=False
+# to only write the aligned pair and the requested variants. weights lists the w_A values
+# or (w_A, w_B) pairs written to all_variations, any other weight can be computed later
+# from the returned store (or PoseVariantStore.from_folder). archive=True stacks the variants
+# into a single memory-mappable VariantArchive instead of one .npy file per weight
+def main_real_real(real_path_npz_1, real_path_npz_2, folder_path, save_intermediates=True, weights=WEIGHT_PAIRS, alpha=0.5, archive=False):
 
     # folder_path_variations = folder_path + "all_variations/"
     # print(folder_path_variations)
@@ -21,58 +27,38 @@ def main_real_real(real_path_npz_1, real_path_npz_2, folder_path):
     print(real_data_1_path)
     print(real_data_2_path)
     
-    # mapping the npz to npy file with 22 joints
-    real_data_1 = map_h36m_to_smpl(real_path_npz_1)
-    np.save(real_data_1_path, real_data_1)
+    # mapping the npz to arrays with 22 joints
+    real_data_1 = map_h36m_to_smpl(real_path_npz_1)  # Shape: (T, J, 3)
+    real_data_2 = map_h36m_to_smpl(real_path_npz_2)  # Shape: (T, J, 3)
 
-    # mapping the npz to npy file with 22 joints
-    real_data_2 = map_h36m_to_smpl(real_path_npz_2)
-    np.save(real_data_2_path, real_data_2)
+    if save_intermediates:
+        np.save(real_data_1_path, real_data_1)
+        np.save(real_data_2_path, real_data_2)
 
     # checking which frames are shorter, to match the frames to be the same
-    # Load the real and synthetic pose data from .npy files
-    P_r = np.load(real_data_1_path)  # Shape: (J, 3)
-    P_s = np.load(real_data_2_path)  # Shape: (J, 3)
-
-    # Determine the smaller array
-    if P_r.shape[0] > P_s.shape[0]:
+    # upsampling the smaller array to the number of frames
+    if real_data_1.shape[0] > real_data_2.shape[0]:
         smaller_array = real_data_2_path
-        bigger_array = real_data_1_path
-        max_frames = P_r.shape[0]
+        pose_data_upsampled = upsample_pose_data(real_data_2, target_frames=real_data_1.shape[0])
+        P_r, P_s = real_data_1, pose_data_upsampled
     else:
+        # in a situation where the first video is shorter than the second
         smaller_array = real_data_1_path
-        bigger_array = real_data_2_path
-        max_frames = P_s.shape[0]
-
-    # upsampling the smaller array to the number of frames
-    pose_data_upsampled = upsample_pose_data(smaller_array, target_frames=max_frames)
+        pose_data_upsampled = upsample_pose_data(real_data_1, target_frames=real_data_2.shape[0])
+        P_r, P_s = real_data_2, pose_data_upsampled
 
     extended_new_path = smaller_array.replace(".npy", "_extended.npy")
 
     # saving the new array
-    np.save(extended_new_path, pose_data_upsampled)
+    if save_intermediates:
+        np.save(extended_new_path, pose_data_upsampled)
     print(pose_data_upsampled.shape)
 
-    # generating the all variations of optimisation files
-    weight_pairs = [
-        (0.1, 0.9),
-        (0.2, 0.8),
-        (0.3, 0.7),
-        (0.4, 0.6),
-        (0.5, 0.5),
-        (0.6, 0.4),
-        (0.7, 0.3),
-        (0.8, 0.2),
-        (0.9, 0.1)
-    ]
+    # keeping the aligned pair so other weights can be generated on demand
+    variant_store = PoseVariantStore(P_r, P_s, alpha=alpha)
+    variant_store.save_pair(folder_path)
 
-    if bigger_array == real_data_1_path:
-        for w_A, w_B in weight_pairs:
-            P_opt = compute_P_opt(real_data_1_path, extended_new_path, alpha=0.5, w_A=w_A, w_B=w_B)
-            np.save(f"{folder_path_variations}/_euclidean_distances_wA{w_A}_wB{w_B}.npy", P_opt)
+    # generating the requested variations of optimisation files in one pass
+    variant_store.save_many(weights, folder_path_variations, archive=archive)
 
-    # in a situation where the real_path is shorter than the synthetic path
-    if smaller_array == real_data_1_path:
-        for w_A, w_B in weight_pairs:
-            P_opt = compute_P_opt(real_data_2_path, extended_new_path, alpha=0.5, w_A=w_A, w_B=w_B) 
-            np.save(f"{folder_path_variations}/_euclidean_distances_wA{w_A}_wB{w_B}.npy", P_opt)
+    return variant_store
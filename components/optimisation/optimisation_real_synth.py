@@ -1,13 +1,19 @@
 import numpy as np
 from scipy.interpolate import interp1d
 from pathlib import Path
-from .optimisation_utils import map_h36m_to_smpl, upsample_pose_data, center_and_rotate_smpl, compute_P_opt
+from .optimisation_utils import map_h36m_to_smpl, upsample_pose_data, center_and_rotate_smpl, WEIGHT_PAIRS
+from .variant_store import PoseVariantStore
 
 # real_pose_path refers to the Generated Tracked-Motion Data
 # synthetic_pose_path refers to the Generated Synthetic-Motion Data
 
 # used when one is real and one is synth
-def main_synth_real(real_path_npz, synthetic_path, folder_path):
+# the arrays are passed between the steps in memory, set save_intermediates=False
+# to only write the aligned pair and the requested variants. weights lists the w_A values
+# or (w_A, w_B) pairs written to all_variations, any other weight can be computed later
+# from the returned store (or PoseVariantStore.from_folder). archive=True stacks the variants
+# into a single memory-mappable VariantArchive instead of one .npy file per weight
+def main_synth_real(real_path_npz, synthetic_path, folder_path, save_intermediates=True, weights=WEIGHT_PAIRS, alpha=0.5, archive=False):
 
     # print(folder_path_variations)
     folder_path_variations = Path(folder_path) / "all_variations"
@@ -19,57 +25,39 @@ def main_synth_real(real_path_npz, synthetic_path, folder_path):
     # change to .npz when real videos are used
     synthetic_path_flipped = synthetic_path.replace(".npy", "_flip.npy")
 
-    # mapping the npz to npy file with 22 joints
-    real_data = map_h36m_to_smpl(real_path_npz)
-    np.save(real_path_npy, real_data)
+    # mapping the npz to an array with 22 joints
+    P_r = map_h36m_to_smpl(real_path_npz)  # Shape: (T, J, 3)
 
     # creating a rotated version of the synthetic
-    center_and_rotate_smpl(synthetic_path, synthetic_path_flipped)
+    P_s = center_and_rotate_smpl(synthetic_path)  # Shape: (T, J, 3)
 
-    # checking which frames are shorter, to match the frames to be the same
-    # Load the real and synthetic pose data from .npy files
-    P_r = np.load(real_path_npy)  # Shape: (J, 3)
-    P_s = np.load(synthetic_path_flipped)  # Shape: (J, 3)
+    if save_intermediates:
+        np.save(real_path_npy, P_r)
+        np.save(synthetic_path_flipped, P_s)
 
-    # Determine the smaller array
+    # checking which frames are shorter, to match the frames to be the same
+    # upsampling the smaller array to the number of frames
     if P_r.shape[0] > P_s.shape[0]:
         smaller_array = synthetic_path_flipped
-        bigger_array = real_path_npy
-        max_frames = P_r.shape[0]
+        pose_data_upsampled = upsample_pose_data(P_s, target_frames=P_r.shape[0])
+        P_s = pose_data_upsampled
     else:
         smaller_array = real_path_npy
-        bigger_array = synthetic_path_flipped
-        max_frames = P_s.shape[0]
-
-    # upsampling the smaller array to the number of frames
-    pose_data_upsampled = upsample_pose_data(smaller_array, target_frames=max_frames)
+        pose_data_upsampled = upsample_pose_data(P_r, target_frames=P_s.shape[0])
+        P_r = pose_data_upsampled
 
     extended_new_path = smaller_array.replace(".npy", "_extended.npy")
 
     # saving the new array
-    np.save(extended_new_path, pose_data_upsampled)
+    if save_intermediates:
+        np.save(extended_new_path, pose_data_upsampled)
     print(pose_data_upsampled.shape)
 
-    # generating the all variations of optimisation files
-    weight_pairs = [
-        (0.1, 0.9),
-        (0.2, 0.8),
-        (0.3, 0.7),
-        (0.4, 0.6),
-        (0.5, 0.5),
-        (0.6, 0.4),
-        (0.7, 0.3),
-        (0.8, 0.2),
-        (0.9, 0.1)
-    ]
-            
-    if bigger_array == real_path_npy:
-        for w_A, w_B in weight_pairs:
-            P_opt = compute_P_opt(real_path_npy, extended_new_path, alpha=0.5, w_A=w_A, w_B=w_B)
-            np.save(f"{folder_path_variations}/_euclidean_distances_wA{w_A}_wB{w_B}.npy", P_opt)
+    # keeping the aligned pair so other weights can be generated on demand
+    variant_store = PoseVariantStore(P_r, P_s, alpha=alpha)
+    variant_store.save_pair(folder_path)
+
+    # generating the requested variations of optimisation files in one pass
+    variant_store.save_many(weights, folder_path_variations, archive=archive)
 
-    # in a situation where the real_path is shorter than the synthetic path
-    if smaller_array == real_path_npy:
-        for w_A, w_B in weight_pairs:
-            P_opt = compute_P_opt(extended_new_path, synthetic_path_flipped, alpha=0.5, w_A=w_A, w_B=w_B) 
-            np.save(f"{folder_path_variations}/_euclidean_distances_wA{w_A}_wB{w_B}.npy", P_opt)
+    return variant_store
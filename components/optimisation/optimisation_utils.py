@@ -1,60 +1,75 @@
 import numpy as np
-from scipy.interpolate import interp1d
+from pathlib import Path
 
-# converts npz to npy
-def map_h36m_to_smpl(real_path_npz):
+def load_pose_data(pose_data, key='reconstruction'):
+    """
+    Return pose data as an array, loading it from disk only when a path is given.
 
-    real_data = np.load(real_path_npz)
-    
-    # restructuring the array
-    h36m_joints = real_data['reconstruction']
-    
+    Args:
+        pose_data (str | Path | np.ndarray): Path to a .npy/.npz file or an already loaded array.
+        key (str): Array to read when pose_data is an .npz file.
+
+    Returns:
+        np.ndarray: The pose data.
     """
-    Maps Human3.6M 17 keypoints to SMPL 24 keypoints.
-    :param h36m_joints: (N, 17, 3) NumPy array of 3D keypoints
-    :return: (N, 24, 3) NumPy array of mapped keypoints
-    """
-    smpl_joints = np.zeros((h36m_joints.shape[0], 22, 3))
-
-    # Mapping H36M to SMPL keypoints
-    h36m_to_smpl = {
-        0: 0,  # Pelvis 
-        1: 4,  # L_Hip (H36M Left Hip)
-        2: 1,  # R_Hip (H36M Right Hip)
-        3: 7,  # Spine1 (H36M Spine)
-        4: 5,  # L_Knee (H36M Left Knee)
-        5: 2,  # R_Knee (H36M Right Knee)
-        6: 8,  # Spine2 (H36M Neck→calculate)
-        7: 6,  # L_Ankle (H36M Left Ankle)
-        8: 3,  # R_Ankle (H36M Right Ankle)
-        9: 8,  # Spine3 (calculate)
-        12: 8, # Neck (H36M Neck)
-        13: 11, # L_Collar (H36M Left Shoulder)
-        14: 14, # R_Collar (H36M Right Shoulder)
-        15: 10, # Head (H36M Head)
-        16: 11, # L_Shoulder (H36M Left Shoulder)
-        17: 14, # R_Shoulder (H36M Right Shoulder)
-        18: 12, # L_Elbow (H36M Left Elbow)
-        19: 15, # R_Elbow (H36M Right Elbow)
-        20: 13, # L_Wrist (H36M Left Wrist)
-        21: 16, # R_Wrist (H36M Right Wrist)
-    }
-
-    # Apply direct mappings
-    for smpl_idx, h36m_idx in h36m_to_smpl.items():
-        smpl_joints[:, smpl_idx, :] = h36m_joints[:, h36m_idx, :]
+    if isinstance(pose_data, (str, Path)):
+        loaded = np.load(pose_data)
+        if isinstance(loaded, np.lib.npyio.NpzFile):
+            return loaded[key]
+        return loaded
 
-    # Compute Spine2 (midpoint of Spine1 and Spine3)
-    smpl_joints[:, 6, :] = (smpl_joints[:, 3, :] + smpl_joints[:, 9, :]) / 2
+    return np.asarray(pose_data)
 
-    # Compute Spine3 (midpoint of Spine2 and Neck)
-    smpl_joints[:, 9, :] = (smpl_joints[:, 6, :] + smpl_joints[:, 12, :]) / 2
+# Gather table mapping Human3.6M 17 keypoints to the first 22 SMPL joints,
+# entry i holds the H36M joint copied into SMPL joint i
+H36M_TO_SMPL_INDEX = np.array([
+    0,   # 0  Pelvis
+    4,   # 1  L_Hip (H36M Left Hip)
+    1,   # 2  R_Hip (H36M Right Hip)
+    7,   # 3  Spine1 (H36M Spine)
+    5,   # 4  L_Knee (H36M Left Knee)
+    2,   # 5  R_Knee (H36M Right Knee)
+    8,   # 6  Spine2 (H36M Neck→calculate)
+    6,   # 7  L_Ankle (H36M Left Ankle)
+    3,   # 8  R_Ankle (H36M Right Ankle)
+    8,   # 9  Spine3 (calculate)
+    6,   # 10 L_Foot (same as L_Ankle)
+    3,   # 11 R_Foot (same as R_Ankle)
+    8,   # 12 Neck (H36M Neck)
+    11,  # 13 L_Collar (H36M Left Shoulder)
+    14,  # 14 R_Collar (H36M Right Shoulder)
+    10,  # 15 Head (H36M Head)
+    11,  # 16 L_Shoulder (H36M Left Shoulder)
+    14,  # 17 R_Shoulder (H36M Right Shoulder)
+    12,  # 18 L_Elbow (H36M Left Elbow)
+    15,  # 19 R_Elbow (H36M Right Elbow)
+    13,  # 20 L_Wrist (H36M Left Wrist)
+    16,  # 21 R_Wrist (H36M Right Wrist)
+])
+
+# converts npz to npy
+def map_h36m_to_smpl(real_path_npz, dtype=np.float64):
+    """
+    Maps Human3.6M 17 keypoints to the first 22 SMPL keypoints.
+    :param real_path_npz: StridedTransformer .npz path, (..., N, 17, 3) NumPy array of 3D keypoints,
+                          or a list of those for batch conversion
+    :param dtype: dtype of the mapped keypoints, e.g. np.float32
+    :return: (..., N, 22, 3) NumPy array of mapped keypoints, or a list of them for a list input
+    """
+    if isinstance(real_path_npz, (list, tuple)):
+        return [map_h36m_to_smpl(item, dtype=dtype) for item in real_path_npz]
+
+    # restructuring the array (accepts the StridedTransformer .npz path or its reconstruction array)
+    h36m_joints = load_pose_data(real_path_npz)
+
+    # Apply direct mappings in a single gather
+    smpl_joints = h36m_joints[..., H36M_TO_SMPL_INDEX, :].astype(dtype, copy=False)
 
-    # L_Foot (same as L_Ankle)
-    smpl_joints[:, 10, :] = smpl_joints[:, 7, :]
+    # Compute Spine2 (midpoint of Spine1 and Spine3)
+    smpl_joints[..., 6, :] = (smpl_joints[..., 3, :] + smpl_joints[..., 9, :]) / 2
 
-    # R_Foot (same as R_Ankle)
-    smpl_joints[:, 11, :] = smpl_joints[:, 8, :]
+    # Compute Spine3 (midpoint of Spine2 and Neck)
+    smpl_joints[..., 9, :] = (smpl_joints[..., 6, :] + smpl_joints[..., 12, :]) / 2
 
     return smpl_joints
 
@@ -63,71 +78,167 @@ def upsample_pose_data(pose_data, target_frames):
     Upsample pose data using linear interpolation to match the target number of frames.
     
     Args:
-        pose_data (np.ndarray): Pose data of shape (T, J, 3),
+        pose_data (np.ndarray | str): Pose data of shape (T, J, 3), or the path to an .npy file holding it,
                                 where T is the number of frames, J is the number of joints.
         target_frames (int): Desired number of frames after upsampling.
     
     Returns:
         np.ndarray: Upsampled pose data with shape (target_frames, J, 3).
     """
-    pose_data = np.load(pose_data)
+    return resample_pose_data(pose_data, target_frames=target_frames)
+
+def resample_pose_data(pose_data, target_frames=None, source_fps=None, target_fps=None):
+    """
+    Resample pose data along the time axis using linear interpolation, in one vectorized pass.
+
+    Works for both up- and down-sampling. The first and last frames are kept and the new frames
+    are spread evenly in between, as in upsample_pose_data.
+
+    Args:
+        pose_data (np.ndarray | str | list): Pose data of shape (..., T, J, 3), e.g. (T, J, 3) or a
+                                batch (N, T, J, 3), a path to an .npy file, or a list of sequences
+                                with different lengths.
+        target_frames (int, optional): Desired number of frames after resampling.
+        source_fps (float, optional): Frame rate of pose_data, used with target_fps.
+        target_fps (float, optional): Desired frame rate, used when target_frames is not given.
+
+    Returns:
+        np.ndarray | list: Resampled pose data of shape (..., target_frames, J, 3), or a list of
+                                resampled sequences when a list was given.
+    """
+    if isinstance(pose_data, (list, tuple)):
+        return [resample_pose_data(sequence, target_frames, source_fps, target_fps) for sequence in pose_data]
+
+    pose_data = load_pose_data(pose_data)
+
+    T = pose_data.shape[-3]  # T = frames, the last two axes are joints and 3D coordinates
+
+    if target_frames is None:
+        if source_fps is None or target_fps is None:
+            raise ValueError("Either target_frames or both source_fps and target_fps must be given")
+        target_frames = max(int(round(T * target_fps / source_fps)), 1)
 
-    T, J, D = pose_data.shape  # Extract shape: T = frames, J = joints, D = 3 (3D coordinates)
     new_times = np.linspace(0, T - 1, target_frames)  # New frame timeline
-    old_times = np.arange(T)  # Original frame timeline
-    new_pose_data = np.empty((target_frames, J, D))  # Placeholder for upsampled data
 
-    # Interpolate each joint and coordinate independently
-    for j in range(J):
-        for d in range(D):
-            f = interp1d(old_times, pose_data[:, j, d], kind='linear', fill_value="extrapolate")
-            new_pose_data[:, j, d] = f(new_times)
+    # a single frame can only be repeated
+    if T == 1:
+        return np.repeat(pose_data.astype(np.float64), target_frames, axis=-3)
+
+    # Index of the original frame on the left of every new frame and the distance to it
+    lower = np.clip(np.floor(new_times).astype(int), 0, T - 2)
+    fraction = (new_times - lower)[:, None, None]  # Shape: (target_frames, 1, 1)
+
+    # Interpolate every joint and coordinate of every sequence at once
+    lower_frames = pose_data[..., lower, :, :]
+    upper_frames = pose_data[..., lower + 1, :, :]
+    new_pose_data = lower_frames + (upper_frames - lower_frames) * fraction
 
     return new_pose_data
     
-def center_and_rotate_smpl(npy_path, output_path):
+# Rotation matrix for 180-degree rotation around the X-axis
+ROTATION_X_180 = np.array([
+    [1,  0,  0],  # X-axis unchanged
+    [0, -1,  0],  # Flip Y-axis
+    [0,  0, -1]   # Flip Z-axis
+])
+
+def rotation_matrix(axis, degrees):
     """
-    Load an .npy file (frames, joints, 3D), center each frame's geometric median as origin,
-    rotate by 180 degrees along the X-axis, and save back the transformed coordinates.
+    Build the 3x3 matrix rotating points by `degrees` around the 'x', 'y' or 'z' axis.
     """
+    theta = np.radians(degrees)
+    c, s = np.cos(theta), np.sin(theta)
 
-    # Load the joint positions from the .npy file (Shape: [Frames, Joints, 3])
-    joint_data = np.load(npy_path)
+    if axis == 'x':
+        return np.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+    if axis == 'y':
+        return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+    if axis == 'z':
+        return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
 
-    # Ensure correct shape (Frames, 22 joints, 3D)
-    if joint_data.shape[1:] != (22, 3):
-        raise ValueError(f"Expected shape (Frames, 22, 3), but got {joint_data.shape}")
+    raise ValueError(f"Unknown rotation axis '{axis}', expected 'x', 'y' or 'z'")
 
-    # Process each frame and center it
-    centered_rotated_data = np.zeros_like(joint_data)
+def normalize_pose_data(joint_data, rotation=ROTATION_X_180, translation='median'):
+    """
+    Center and rotate pose sequences with a single matrix multiplication.
 
-    # Rotation matrix for 180-degree rotation around the X-axis
-    rotation_matrix = np.array([
-        [1,  0,  0],  # X-axis unchanged
-        [0, -1,  0],  # Flip Y-axis
-        [0,  0, -1]   # Flip Z-axis
-    ])
+    Args:
+        joint_data (np.ndarray | str): Pose data of shape (..., T, J, 3), e.g. (T, J, 3) or a batch
+                                (N, T, J, 3), or the path to an .npy file holding it. Any J is accepted.
+        rotation (np.ndarray | tuple | None): 3x3 rotation matrix, an (axis, degrees) pair such as
+                                ('x', 180), or None to skip the rotation.
+        translation (str | np.ndarray | None): 'median' to move the median joint of the first frame
+                                of every sequence to the origin, an offset of shape (3,) (or
+                                broadcastable to (..., 1, 1, 3)) to subtract, or None to skip it.
 
-    # Compute the median center of all joints
-    median_center = np.median(joint_data[0], axis=0)
+    Returns:
+        np.ndarray: The centered and rotated pose data, same shape as joint_data.
+    """
+    joint_data = load_pose_data(joint_data)
+
+    if isinstance(translation, str):
+        if translation != 'median':
+            raise ValueError(f"Unknown translation '{translation}', expected 'median', an array or None")
+
+        # Compute the median center of all joints of the first frame, one per sequence
+        translation = np.median(joint_data[..., 0, :, :], axis=-2)[..., None, None, :]
+
+    if translation is not None:
+        joint_data = joint_data - translation
+
+    if rotation is None:
+        return joint_data
 
-    for frame_idx in range(joint_data.shape[0]):  # Iterate over frames
-        frame_joints = joint_data[frame_idx]  # Shape (22, 3)
+    if isinstance(rotation, tuple):
+        rotation = rotation_matrix(*rotation)
 
-        # Shift all joints so that the median is at (0,0,0)
-        centered_frame = frame_joints - median_center
+    rotation = np.asarray(rotation)
 
-        # Apply rotation to each joint
-        rotated_frame = np.dot(centered_frame, rotation_matrix.T)  # Matrix multiplication
+    # keep the dtype of the pose data (e.g. float32 text-to-motion output)
+    if np.issubdtype(joint_data.dtype, np.floating):
+        rotation = rotation.astype(joint_data.dtype)
 
-        # Store back into the new array
-        centered_rotated_data[frame_idx] = rotated_frame
+    # Apply the rotation to every joint of every frame at once
+    return joint_data @ rotation.T
+
+def center_and_rotate_smpl(npy_path, output_path=None):
+    """
+    Load an .npy file (frames, joints, 3D), center each frame's geometric median as origin,
+    rotate by 180 degrees along the X-axis, and return the transformed coordinates.
+    npy_path may also be an already loaded array; the result is only saved when output_path is given.
+    """
+
+    # Load the joint positions from the .npy file (Shape: [Frames, Joints, 3])
+    joint_data = load_pose_data(npy_path)
+
+    # Ensure correct shape (Frames, 22 joints, 3D)
+    if joint_data.shape[1:] != (22, 3):
+        raise ValueError(f"Expected shape (Frames, 22, 3), but got {joint_data.shape}")
+
+    # Shift all joints so that the median is at (0,0,0) and rotate them
+    centered_rotated_data = normalize_pose_data(joint_data, rotation=ROTATION_X_180, translation='median')
 
     # Save the new numpy array with centered and rotated data
-    np.save(output_path, centered_rotated_data)
+    if output_path is not None:
+        np.save(output_path, centered_rotated_data)
 
     # print(f"Centered and rotated data saved to {output_path}")
 
+    return centered_rotated_data
+
+
+# weight pairs (w_A, w_B) generated for every video by the optimisation entry points
+WEIGHT_PAIRS = [
+    (0.1, 0.9),
+    (0.2, 0.8),
+    (0.3, 0.7),
+    (0.4, 0.6),
+    (0.5, 0.5),
+    (0.6, 0.4),
+    (0.7, 0.3),
+    (0.8, 0.2),
+    (0.9, 0.1)
+]
 
 def compute_P_opt(real_pose_path, synthetic_pose_path, alpha, w_A, w_B):
     """
@@ -148,19 +259,47 @@ def compute_P_opt(real_pose_path, synthetic_pose_path, alpha, w_A, w_B):
     P_r = np.load(real_pose_path)  # Shape: (J, 3)
     P_s = np.load(synthetic_pose_path)  # Shape: (J, 3)
     
-    # Compute the weighted difference vector for each joint
-    D_vector = w_A * P_r - w_B * P_s  # Shape: (J, 3)
-    
-    # Compute the norm (scalar distance) for each joint
-    d = np.linalg.norm(D_vector, axis=1, keepdims=True)  # Shape: (J, 1)
-    
+    return compute_P_opt_batch(P_r, P_s, alpha, [(w_A, w_B)])[0]
+
+def compute_P_opt_batch(P_r, P_s, alpha, weight_pairs=WEIGHT_PAIRS):
+    """
+    Compute P_opt for every (w_A, w_B) pair in a single broadcast operation.
+
+    Args:
+        P_r (np.ndarray): Real pose data of shape (T, J, 3).
+        P_s (np.ndarray): Synthetic pose data of shape (T, J, 3), same shape as P_r.
+        alpha (float): Scaling factor.
+        weight_pairs (list): Sequence of (w_A, w_B) pairs, W pairs in total.
+
+    Returns:
+        np.ndarray: The optimal poses of shape (W, T, J, 3), in the order of weight_pairs.
+    """
+
+    P_r = np.asarray(P_r)
+    P_s = np.asarray(P_s)
+
+    if P_r.shape != P_s.shape:
+        raise ValueError(f"Real and synthetic poses must have the same shape, got {P_r.shape} and {P_s.shape}")
+
+    # weights broadcast against the pose arrays, shape (W, 1, 1, 1)
+    weights = np.asarray(weight_pairs, dtype=np.float64).reshape(-1, 2)
+    broadcast_shape = (-1,) + (1,) * P_r.ndim
+    w_A = weights[:, 0].reshape(broadcast_shape)
+    w_B = weights[:, 1].reshape(broadcast_shape)
+
+    # Compute the weighted difference vector for each variant
+    D_vector = w_A * P_r - w_B * P_s  # Shape: (W, T, J, 3)
+
+    # Same norm axis as the single pair computation (axis 1 of each variant)
+    d = np.linalg.norm(D_vector, axis=2, keepdims=True)
+
     # Avoid division by zero by setting zero norms to one (will be multiplied by 0 anyway)
     d_safe = np.where(d == 0, 1, d)
-    
+
     # Compute the unit direction vector for each joint
-    u = D_vector / d_safe  # Shape: (J, 3)
+    u = D_vector / d_safe
 
-    # Compute the optimal pose for each joint
+    # Compute the optimal pose of every variant
     P_opt = P_r + alpha * d * u
-    
+
     return P_opt
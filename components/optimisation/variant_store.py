@@ -0,0 +1,272 @@
+import json
+import os
+import uuid
+import numpy as np
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+from .optimisation_utils import compute_P_opt_batch
+
+# file holding the aligned real/synthetic pair, next to the all_variations folder
+ALIGNED_PAIR_FILENAME = "aligned_pair.npz"
+
+# consolidated variants of a video or pair, inside the all_variations folder. Every rewrite goes
+# to a new variants.<id>.npy named by the index, VARIANTS_FILENAME is the archive of older indexes
+VARIANTS_FILENAME = "variants.npy"
+VARIANTS_INDEX_FILENAME = "variants_index.json"
+
+def variant_filename(w_A, w_B):
+    """
+    Name of the .npy file of a single variant, e.g. _euclidean_distances_wA0.1_wB0.9.npy
+    """
+    return f"_euclidean_distances_wA{w_A}_wB{w_B}.npy"
+
+def normalise_weights(weights):
+    """
+    Turn a w_A value or a (w_A, w_B) pair into a rounded (w_A, w_B) pair, with w_B = 1 - w_A by default.
+    """
+    if np.isscalar(weights):
+        w_A, w_B = weights, 1 - weights
+    else:
+        w_A, w_B = weights
+
+    return round(float(w_A), 6), round(float(w_B), 6)
+
+class PoseVariantStore:
+    """
+    Holds an aligned real/synthetic pose pair and computes P_opt variants on demand.
+
+    Any continuous weight (and alpha) can be requested. The most recent results are kept in an
+    LRU cache and nothing is written to disk unless save() or save_pair() is called.
+
+    Args:
+        P_r (np.ndarray): Real pose data of shape (T, J, 3).
+        P_s (np.ndarray): Synthetic pose data of shape (T, J, 3), aligned to P_r.
+        alpha (float): Default scaling factor for P_opt.
+        cache_size (int): Number of variants kept in memory.
+    """
+
+    def __init__(self, P_r, P_s, alpha=0.5, cache_size=4):
+        if P_r.shape != P_s.shape:
+            raise ValueError(f"Real and synthetic poses must be aligned, got {P_r.shape} and {P_s.shape}")
+
+        self.P_r = P_r
+        self.P_s = P_s
+        self.alpha = alpha
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @classmethod
+    def from_folder(cls, folder_path, **kwargs):
+        """
+        Rebuild the store from the aligned pair saved by save_pair().
+        """
+        pair = np.load(Path(folder_path) / ALIGNED_PAIR_FILENAME)
+        return cls(pair["P_r"], pair["P_s"], **kwargs)
+
+    def save_pair(self, folder_path):
+        """
+        Persist the aligned pair so the store can be rebuilt later with from_folder().
+        """
+        pair_path = Path(folder_path) / ALIGNED_PAIR_FILENAME
+        np.savez(pair_path, P_r=self.P_r, P_s=self.P_s)
+        return pair_path
+
+    def get(self, weights, alpha=None):
+        """
+        Return the P_opt variant of shape (T, J, 3) for a w_A value or a (w_A, w_B) pair.
+        """
+        return self.get_many([weights], alpha=alpha)[0]
+
+    def get_many(self, weight_list, alpha=None):
+        """
+        Return the P_opt variants for several weights, computing all cache misses in one batch.
+        """
+        alpha = self.alpha if alpha is None else alpha
+        keys = [normalise_weights(weights) + (alpha,) for weights in weight_list]
+        unique_keys = list(dict.fromkeys(keys))
+
+        found = {key: self._cache[key] for key in unique_keys if key in self._cache}
+        missing = [key for key in unique_keys if key not in found]
+        if missing:
+            variants = compute_P_opt_batch(self.P_r, self.P_s, alpha, [key[:2] for key in missing])
+            found.update(zip(missing, variants))
+
+        for key in unique_keys:
+            self._remember(key, found[key])
+
+        return [found[key] for key in keys]
+
+    def save(self, weights, folder_path, alpha=None, archive=False):
+        """
+        Write a single variant to folder_path and return its path.
+        """
+        return self.save_many([weights], folder_path, alpha=alpha, archive=archive)[0]
+
+    def save_many(self, weight_list, folder_path, alpha=None, archive=False):
+        """
+        Write the requested variants to folder_path and return their paths.
+
+        With archive=True the variants are added to the folder's VariantArchive instead of being
+        written as separate .npy files, and the archive path is returned for each of them.
+        """
+        folder_path = Path(folder_path)
+        folder_path.mkdir(parents=True, exist_ok=True)
+
+        if archive:
+            alpha = self.alpha if alpha is None else alpha
+            archive_path = VariantArchive.append(folder_path, weight_list, self.get_many(weight_list, alpha=alpha), alpha)
+            return [archive_path] * len(weight_list)
+
+        paths = []
+        for weights, P_opt in zip(weight_list, self.get_many(weight_list, alpha=alpha)):
+            path = folder_path / variant_filename(*normalise_weights(weights))
+            np.save(path, P_opt)
+            paths.append(path)
+
+        return paths
+
+    def _remember(self, key, P_opt):
+        self._cache[key] = P_opt
+        self._cache.move_to_end(key)
+
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+class VariantArchive:
+    """
+    All P_opt variants of a video or pair in one memory-mappable (W, T, J, 3) .npy file.
+
+    A small JSON index names the archive file and maps every (w_A, w_B, alpha) to its slice, so a
+    lookup is a dict access and only the pages of the requested slice are read from disk.
+
+    Args:
+        folder_path (str | Path): The all_variations folder holding the archive.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = Path(folder_path)
+        self.archive_path = self.folder_path / VARIANTS_FILENAME
+        self.index_path = self.folder_path / VARIANTS_INDEX_FILENAME
+
+        self.entries = []
+        self.variants = None
+
+        # an archive removed between reading the index and opening it was replaced by a writer, the new index is read
+        for attempt in range(3):
+            if not self.index_path.exists():
+                break
+
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+            self.entries = [tuple(entry) for entry in index["variants"]]
+            self.archive_path = self.folder_path / index.get("archive", VARIANTS_FILENAME)
+
+            try:
+                self.variants = np.load(self.archive_path, mmap_mode="r")
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+        self.index = {entry: position for position, entry in enumerate(self.entries)}
+
+        # lookups without an alpha resolve to the first variant stored for the weights
+        self.weight_index = {}
+        for position, entry in enumerate(self.entries):
+            self.weight_index.setdefault(entry[:2], position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, weights):
+        return self._find(weights) is not None
+
+    def get(self, weights, alpha=None):
+        """
+        Return the memory-mapped (T, J, 3) variant for a w_A value or a (w_A, w_B) pair.
+        When alpha is None the first variant stored for these weights is returned.
+        """
+        position = self._find(weights, alpha)
+        if position is None:
+            raise KeyError(f"No variant for weights {weights} (alpha={alpha}) in {self.archive_path}")
+
+        return self.variants[position]
+
+    def _find(self, weights, alpha=None):
+        w_A, w_B = normalise_weights(weights)
+
+        if alpha is not None:
+            return self.index.get((w_A, w_B, round(float(alpha), 6)))
+
+        return self.weight_index.get((w_A, w_B))
+
+    @classmethod
+    def append(cls, folder_path, weight_list, variants, alpha):
+        """
+        Add variants to the archive in folder_path, replacing entries with the same weights and alpha.
+
+        The archive is rewritten to a new file next to the old one, and the index naming it is
+        swapped in with a single rename, so readers see either the old or the new variants and
+        index, never a mix of the two or a partially written file.
+        """
+        existing = cls(folder_path)
+        alpha = round(float(alpha), 6)
+
+        new_entries = [normalise_weights(weights) + (alpha,) for weights in weight_list]
+        new_variants = np.stack([np.asarray(variant) for variant in variants])
+
+        if existing.variants is not None and existing.variants.shape[1:] != new_variants.shape[1:]:
+            raise ValueError(f"Variants of shape {new_variants.shape[1:]} do not match the archive shape {existing.variants.shape[1:]}")
+
+        kept = [position for position, entry in enumerate(existing.entries) if entry not in new_entries]
+        entries = [existing.entries[position] for position in kept] + new_entries
+
+        # writing the stacked array directly into a new file instead of concatenating in memory
+        archive_path = Path(folder_path) / f"variants.{uuid.uuid4().hex}.npy"
+        dtype = np.result_type(new_variants, existing.variants) if kept else new_variants.dtype
+        stacked = np.lib.format.open_memmap(archive_path, mode="w+", dtype=dtype, shape=(len(entries),) + new_variants.shape[1:])
+        for target, position in enumerate(kept):
+            stacked[target] = existing.variants[position]
+        stacked[len(kept):] = new_variants
+        stacked.flush()
+        old_archive_path = existing.archive_path if existing.variants is not None else None
+        del stacked, existing
+
+        temp_index_path = Path(folder_path) / (VARIANTS_INDEX_FILENAME + f".{uuid.uuid4().hex}.tmp")
+        with open(temp_index_path, "w", encoding="utf-8") as file:
+            json.dump({"archive": archive_path.name, "variants": [list(entry) for entry in entries]}, file)
+
+        # the only step readers can see, publishing the new archive and its index together
+        os.replace(temp_index_path, Path(folder_path) / VARIANTS_INDEX_FILENAME)
+
+        # readers that already mapped the old archive keep their view of it
+        if old_archive_path is not None:
+            try:
+                old_archive_path.unlink()
+            except OSError:
+                pass
+
+        return archive_path
+
+def archived_variant(folder_path, weights, alpha, lock=None):
+    """
+    Return the (T, J, 3) variant of weights for alpha from the archive in <folder_path>/all_variations.
+
+    A variant that was not written for this alpha during optimisation is generated from the aligned
+    pair and added to the archive first. lock serialises the archive updates of concurrent callers.
+    """
+    variation_folder = Path(folder_path) / "all_variations"
+
+    try:
+        return VariantArchive(variation_folder).get(weights, alpha=alpha)
+    except KeyError:
+        pass
+
+    with lock or nullcontext():
+        # another caller may have archived it while waiting for the lock
+        if VariantArchive(variation_folder)._find(weights, alpha) is None:
+            PoseVariantStore.from_folder(folder_path, alpha=alpha).save(weights, variation_folder, archive=True)
+
+    return VariantArchive(variation_folder).get(weights, alpha=alpha)
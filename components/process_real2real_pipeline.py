@@ -1,12 +1,18 @@
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-import shutil
 import os
+import threading
 from optimisation.optimisation_both_real import main_real_real
+from optimisation.variant_store import archived_variant, variant_filename, normalise_weights, ALIGNED_PAIR_FILENAME
 from dotenv import dotenv_values
 from itertools import combinations
 import random
-from utils.blender_utils import npy_to_video, find_file_by_weights
+from utils.blender_utils import SmplFittingService, WarmStarts, npy_to_video, find_file_by_weights, render_config
+from utils.fingerprints import StageFingerprints, stage_fingerprint
+from utils.pose_cache import PoseCache, strided_transformer_config
+from utils.pose_worker import PoseEstimationWorker, StridedTransformerEstimator
+from utils.storage import TransferStats, link_or_copy, transfer_stats
 
 
 env_vars = dotenv_values(".env")  
@@ -17,6 +23,82 @@ env_vars = dotenv_values(".env")
 
 StridedTransformer_path = env_vars.get("STRIDED_TRANSFORMER")
 
+# Scaling factor of P_opt, part of the optimisation fingerprint
+alpha = 0.5
+
+# Pose estimations shared across pairs, defaults to <output_directory>/.pose_cache
+pose_cache_path = env_vars.get("POSE_CACHE")
+
+# persistent StridedTransformer worker, started by both_real_main
+pose_worker = None
+
+# persistent joints2smpl workers, SMPL_FIT_SERVICE_WORKERS of them, started by both_real_main
+fitting_service = None
+
+# adding variants to the archive of a pair is serialised, its weights are rendered in parallel
+variant_archive_lock = threading.Lock()
+
+def render_variant(folder_path, video_folder_name, fingerprints, warm_starts, weight_A, stats):
+    try:
+        render_weight(folder_path, video_folder_name, fingerprints, warm_starts, weight_A, stats)
+    finally:
+        # a variant that was skipped or failed has no fit to share, its neighbours start from the mean pose
+        warm_starts.fitted(weight_A, None)
+
+def render_weight(folder_path, video_folder_name, fingerprints, warm_starts, weight_A, stats):
+
+    # ==============================
+    # Generating the video of one weight
+    # ==============================
+
+    # all_variations_folder_path name
+    variation_folder = folder_path + "/all_variations"
+
+    weight_B = round(1-weight_A,2)
+    weights = (weight_A, weight_B)
+
+    # the variant is resolved by (weights, alpha) from the aligned pair and the archive, folders of older
+    # runs without an aligned pair only hold one .npy file per weight, written for an unknown alpha
+    aligned_pair_path = folder_path + "/" + ALIGNED_PAIR_FILENAME
+    has_aligned_pair = os.path.exists(aligned_pair_path)
+    legacy_npy_path = None if has_aligned_pair else find_file_by_weights(variation_folder, weights)
+
+    if not has_aligned_pair and legacy_npy_path is None:
+        raise FileNotFoundError(f"🚨 ERROR: No aligned pair or variant file for weights {weights} in {folder_path}")
+
+    # every weight is rendered to its own videos_generated folder, so it has its own fingerprint
+    # the fingerprint hashes the source the variant is resolved from, never a stale per-weight file,
+    # and the fit options and scripts the video is rendered with
+    render_stage = f"render_wA{weight_A}"
+    render_fingerprint = stage_fingerprint([aligned_pair_path if has_aligned_pair else legacy_npy_path], {"weights": weights, "alpha": alpha, **render_config()})
+
+    if fingerprints.is_current(render_stage, render_fingerprint):
+        print(f"Log: Skipping rendering of w_A={weight_A}, the video is up to date")
+        return
+
+    fingerprints.invalidate(render_stage)
+
+    if has_aligned_pair:
+        # reading only the slice of the requested weights, generated for this alpha if it was not archived yet
+        pose_data = archived_variant(folder_path, weights, alpha, lock=variant_archive_lock)
+        npy_file_path = os.path.join(variation_folder, variant_filename(*normalise_weights(weights)))
+    else:
+        pose_data = None
+        npy_file_path = legacy_npy_path
+
+    # fitted from the closest weight already fitted, released to the next weights before the Blender render
+    generated_video_path = npy_to_video(video_folder_name, npy_file_path, pose_data=pose_data, stats=stats, fitting_service=fitting_service,
+                                        init_params=warm_starts.init_params(weight_A), on_fitted=partial(warm_starts.fitted, weight_A))
+
+    source_video = Path(generated_video_path)
+    destination_video = video_generated_paths[weight_A] / source_video.name
+    link_or_copy(source_video, destination_video, stats=stats)
+
+    print(f"VIDEO GENERATING NOW!!!")
+    print(f"Log: Files handed over for {video_folder_name} - {stats.summary()}")
+
+    fingerprints.record(render_stage, render_fingerprint, {"generated_video_path": destination_video})
+
 def auto_npy_generation(video_files_1, video_files_2, video_folder_name, StridedTransformer_path):
 
     # video_name
@@ -39,90 +121,88 @@ def auto_npy_generation(video_files_1, video_files_2, video_folder_name, Strided
 
     os.makedirs(folder_path, exist_ok=True)  # ✅ Ensure the folder exists
 
-    # checking if real_path_npz of video_1 exists, if it does, skip to genereation of video
-    npz_found = folder_path + "output_keypoints_3d" + "_" + video_name_1 + ".npz"    
+    # stages whose inputs and parameters did not change since the last run are skipped
+    fingerprints = StageFingerprints(folder_path)
 
-    if not os.path.exists(npz_found):
+    # bytes linked or copied for this pair
+    pair_stats = TransferStats()
 
-        # ==============================
-        # 1️⃣ GENERATE TRACKED-MOTION DATA FOR BOTH VIDEOS (Strided Transformer) 
-        # ==============================
+    # ==============================
+    # 1️⃣ GENERATE TRACKED-MOTION DATA FOR BOTH VIDEOS (Strided Transformer) 
+    # ==============================
 
-        # Define the path to StridedTransformer-Pose3D
-        StridedTransformer_path = Path(StridedTransformer_path)
+    pose_fingerprint = stage_fingerprint([video_files_1, video_files_2], pose_cache.estimator_config)
 
-        # Copy the video files to StridedTransformer for processing
-        destination_1 = StridedTransformer_path / "demo/video" / video_name_1
-        destination_2 = StridedTransformer_path / "demo/video" / video_name_2
+    if fingerprints.is_current("pose_estimation", pose_fingerprint):
+        print("Log: Skipping pose estimation, the videos did not change")
+        pose_outputs = fingerprints.outputs("pose_estimation")
+        real_path_npz_1, real_path_npz_2 = pose_outputs["real_path_npz_1"], pose_outputs["real_path_npz_2"]
 
-        shutil.copy(video_files_1, destination_1)
-        shutil.copy(video_files_2, destination_2)
+    else:
+        fingerprints.invalidate("pose_estimation")
 
-        print("Log: Video copied to StridedTransformer, running it!")
+        # Each video is estimated once and shared by every pair it appears in
+        print("Log: Retrieving pose estimations from the cache, running StridedTransformer on new videos")
 
-        # Run the StridedTransformer script for 3D pose estimation
-        subprocess.run(["python", "demo/vis.py", "--video", video_name_1], cwd=StridedTransformer_path)
-        subprocess.run(["python", "demo/vis.py", "--video", video_name_2], cwd=StridedTransformer_path)
+        copying_from_1 = pose_cache.estimate(video_files_1, video_name_1, StridedTransformer_path, estimator=pose_worker.estimate if pose_worker else None)
+        copying_from_2 = pose_cache.estimate(video_files_2, video_name_2, StridedTransformer_path, estimator=pose_worker.estimate if pose_worker else None)
 
         print("Log: StridedTransformer processing completed")
         
-        # Retrieving generation .npz files from StridedTransformer Repo
+        # Retrieving generation .npz files from the pose cache, cache entries are never rewritten so they are linked
         real_path_npz_1 = folder_path + '/output_keypoints_3d' + "_" + video_name_1 + '.npz'
         real_path_npz_2 = folder_path + '/output_keypoints_3d' + "_" + video_name_2 + '.npz'
 
-        copying_from_1 = StridedTransformer_path / "demo/output" / video_name_1 / "output_3D/output_keypoints_3d.npz"
+        link_or_copy(copying_from_1, real_path_npz_1, stats=pair_stats)
+        link_or_copy(copying_from_2, real_path_npz_2, stats=pair_stats)
 
-        copying_from_2 = StridedTransformer_path / "demo/output" / video_name_2 / "output_3D/output_keypoints_3d.npz"
+        print("Log: Linked generated NPZ file to dataset folder")
 
-        if not copying_from_1.exists():
-            raise FileNotFoundError(f"🚨 ERROR: Generated NPZ file not found in {copying_from_1}")
+        fingerprints.record("pose_estimation", pose_fingerprint, {"real_path_npz_1": real_path_npz_1, "real_path_npz_2": real_path_npz_2})
 
-        if not copying_from_2.exists():
-            raise FileNotFoundError(f"🚨 ERROR: Generated NPZ file not found in {copying_from_2}")
+    # ==============================
+    # 2️⃣ OPTIMIZE MOTION DATA
+    # ==============================
 
-        shutil.copy(copying_from_1, real_path_npz_1)
-        shutil.copy(copying_from_2, real_path_npz_2)
+    optimisation_fingerprint = stage_fingerprint([real_path_npz_1, real_path_npz_2], {"alpha": alpha, "weights": weights_A})
 
-        print("Log: Copied generated NPZ file to dataset folder")
+    if fingerprints.is_current("optimisation", optimisation_fingerprint):
+        print("Log: Skipping generation of synthetic data .npy files")
 
-        # ==============================
-        # 2️⃣ OPTIMIZE MOTION DATA
-        # ==============================
+    else:
+        fingerprints.invalidate("optimisation")
 
         print("Log: Running optimization with real and synthetic motion data")
 
         print(f"variable {folder_path}")
 
-        main_real_real(real_path_npz_1, real_path_npz_2, folder_path)
+        # the weights of this run are computed in one batch, others are generated on demand,
+        # the mapped, flipped and extended arrays stay in memory
+        main_real_real(real_path_npz_1, real_path_npz_2, folder_path, weights=weights_A, alpha=alpha, archive=True,
+                       save_intermediates=False)
 
         print("🎉 Motion optimization completed!")
 
-    else:
-        print("Log: Skipping generation of synthetic data .npy files")
+        fingerprints.record("optimisation", optimisation_fingerprint, {"aligned_pair_path": folder_path + "/" + ALIGNED_PAIR_FILENAME,
+                                                                         "variation_folder": folder_path + "/all_variations"})
 
     # ==============================
-    # 3️⃣ Generating the video
+    # 3️⃣ Generating the videos, the weights of the sweep are rendered in parallel
     # ==============================
 
-    # all_variations_folder_path name
-    variation_folder = folder_path + "/all_variations"
-
-    weight_B = round(1-weight_A,2)
-    weights = (weight_A, weight_B)
-
-    npy_file_path = find_file_by_weights(variation_folder, weights)
-    
-    generated_video_path = npy_to_video(video_folder_name, npy_file_path)
+    # every weight is fitted from its closest weight already fitted, submitted after it so no render waits on a queued one
+    warm_starts = WarmStarts(weights_A)
 
-    source_video = Path(generated_video_path)
-    destination_video = video_generated_path / source_video.name
-    shutil.copy(source_video, destination_video)
+    with ThreadPoolExecutor(max_workers=render_workers or len(weights_A)) as executor:
+        list(executor.map(partial(render_variant, folder_path, video_folder_name, fingerprints, warm_starts, stats=pair_stats), warm_starts.order))
 
-    print(f"VIDEO GENERATING NOW!!!")
+# weight_A_value is a w_A value or a list of them, every weight is rendered to its own videos_generated_real2_<w_A> folder
+# number_of_render_workers limits the weights rendered at the same time, defaults to all of them
+def both_real_main(weight_A_value, input_directory_path, output_directory_path, number_of_videos, number_of_render_workers=None):
 
-def both_real_main(weight_A_value, input_directory_path, output_directory_path, number_of_videos):
+    global weights_A, video_generated_paths, videos_path, video_directory, output_directory, pose_cache, pose_worker, render_workers, fitting_service
 
-    global weight_A, video_generated_path, videos_path, video_directory, output_directory
+    render_workers = number_of_render_workers
 
     # Directory containing the MP4 video files to process
     videos_path = input_directory_path
@@ -131,6 +211,9 @@ def both_real_main(weight_A_value, input_directory_path, output_directory_path,
     # Root dataset directory where results and extracted data will be saved
     output_directory = Path(output_directory_path)  
 
+    # Cache of StridedTransformer outputs keyed by video content, so a video in several pairs is estimated once
+    pose_cache = PoseCache(pose_cache_path or output_directory / ".pose_cache", strided_transformer_config(StridedTransformer_path))
+
     # random seed
     random.seed(42)
 
@@ -138,14 +221,15 @@ def both_real_main(weight_A_value, input_directory_path, output_directory_path,
     number_of_videos_desired = number_of_videos
 
     # Weights declaration (1.dp)
-    weight_A = weight_A_value
+    weights_A = list(weight_A_value) if isinstance(weight_A_value, (list, tuple)) else [weight_A_value]
 
-    # creating a folder called videos_generated
+    # creating a folder called videos_generated for each weight
     # Define original and generated video paths
-    video_generated_path = video_directory.parent / f"videos_generated_real2_{weight_A}"  # Replace "videos" with "videos_generated"
+    video_generated_paths = {weight_A: video_directory.parent / f"videos_generated_real2_{weight_A}" for weight_A in weights_A}  # Replace "videos" with "videos_generated"
 
-    # Create the folder if it doesn't exist
-    video_generated_path.mkdir(parents=True, exist_ok=True)
+    # Create the folders if they don't exist
+    for video_generated_path in video_generated_paths.values():
+        video_generated_path.mkdir(parents=True, exist_ok=True)
 
     # ==============================
     # PROCESS MULTIPLE VIDEOS
@@ -167,31 +251,45 @@ def both_real_main(weight_A_value, input_directory_path, output_directory_path,
         print("⚠️ Not enough combinations available! Using all available combinations.")
         random_selection = []
 
-    for video_1_path, video_2_path in random_selection:
+    # Long-lived StridedTransformer process, the models are loaded once for all the videos
+    pose_worker = PoseEstimationWorker(StridedTransformerEstimator(StridedTransformer_path))
 
-        # Path type
-        video_1_path_type = Path(video_1_path)
-        video_2_path_type = Path(video_2_path)
+    # Long-lived joints2smpl processes, the SMPL models are loaded once for all the variants
+    fitting_service = SmplFittingService(num_workers=int(env_vars.get("SMPL_FIT_SERVICE_WORKERS") or 1))
 
-        name_1 = video_1_path_type.stem
-        name_2 = video_2_path_type.stem
+    try:
+        for video_1_path, video_2_path in random_selection:
 
-        # folder_title
-        video_name = name_1 + "_" + name_2
+            # Path type
+            video_1_path_type = Path(video_1_path)
+            video_2_path_type = Path(video_2_path)
+
+            name_1 = video_1_path_type.stem
+            name_2 = video_2_path_type.stem
+
+            # folder_title
+            video_name = name_1 + "_" + name_2
         
-        # Create a dedicated folder for each video in the output directory
-        video_folder = output_directory / video_name
-        video_folder.mkdir(parents=True, exist_ok=True) # ✅ Ensure the folder exists
-        print(f"📂 Created folder: {video_folder}")
+            # Create a dedicated folder for each video in the output directory
+            video_folder = output_directory / video_name
+            video_folder.mkdir(parents=True, exist_ok=True) # ✅ Ensure the folder exists
+            print(f"📂 Created folder: {video_folder}")
+
+            # Copy the video files into its dedicated folder
+            destination_video_path_1 = video_folder / video_1_path_type.name
+            destination_video_path_2 = video_folder / video_2_path_type.name
 
-        # Copy the video files into its dedicated folder
-        destination_video_path_1 = video_folder / video_1_path_type.name
-        destination_video_path_2 = video_folder / video_2_path_type.name
+            link_or_copy(video_1_path_type, destination_video_path_1)
+            link_or_copy(video_2_path_type, destination_video_path_2)
 
-        shutil.copy(video_1_path_type, destination_video_path_1) 
-        shutil.copy(video_2_path_type, destination_video_path_2) 
+            print(f"🎥 Linked video to: {destination_video_path_1} & {destination_video_path_1} ")
 
-        print(f"🎥 Copied video to: {destination_video_path_1} & {destination_video_path_1} ")
+            # Start the full processing pipeline for this video
+            auto_npy_generation(video_1_path, video_2_path, video_name, StridedTransformer_path)
+    finally:
+        pose_worker.close()
+        pose_worker = None
+        fitting_service.close()
+        fitting_service = None
 
-        # Start the full processing pipeline for this video
-        auto_npy_generation(video_1_path, video_2_path, video_name, StridedTransformer_path)
+    print(f"Log: Files handed over in total - {transfer_stats.summary()}")
@@ -1,12 +1,20 @@
-from video_processing.motioncaptioning import process_videos
-from video_processing.models import action_class
-import subprocess
+from video_processing.async_captioning import caption_videos, caption_config
+from video_processing.caption_cache import CaptionCache
+from video_processing.models import action_class, FRAME_MAX_SIZE, FRAME_JPEG_QUALITY
 from pathlib import Path
-import shutil
+from functools import partial
 import os
+import threading
 from optimisation.optimisation_real_synth import main_synth_real
+from optimisation.variant_store import archived_variant, variant_filename, normalise_weights, ALIGNED_PAIR_FILENAME
 from dotenv import dotenv_values
-from utils.blender_utils import npy_to_video, find_file_by_weights
+from utils.blender_utils import SmplFittingService, WarmStarts, npy_to_video, find_file_by_weights, render_config
+from utils.fingerprints import StageFingerprints, stage_fingerprint
+from utils.pose_cache import run_strided_transformer, strided_transformer_config
+from utils.pose_worker import PoseEstimationWorker, StridedTransformerEstimator
+from utils.stage_graph import StageGraph
+from utils.storage import TransferStats, link_or_copy, move_or_copy, transfer_stats
+from utils.text_to_motion import generate_motions_batch
 
 
 env_vars = dotenv_values(".env")  
@@ -18,17 +26,36 @@ env_vars = dotenv_values(".env")
 StridedTransformer_path = env_vars.get("STRIDED_TRANSFORMER")
 text_to_motion_path = env_vars.get("TEXT_TO_MOTION")
 
-def auto_npy_generation(video_files, video_name, StridedTransformer_path, text_to_motion_path):
+# Scaling factor of P_opt, part of the optimisation fingerprint
+alpha = 0.5
 
-    """
-    Automates the process of generating .npy motion files from a video.
-    
-    Steps:
-    1. Extracts motion description using ChatGPT.
-    2. Generates text-based motion using the text-to-motion repository.
-    3. Processes motion through StridedTransformer-Pose3D.
-    4. Optimizes and combines motion data.
-    """
+# Captions shared across runs, defaults to <output_directory>/.caption_cache
+caption_cache_path = env_vars.get("CAPTION_CACHE")
+
+# renders of different weights run in parallel, adding variants to the archive of a video is serialised
+variant_archive_lock = threading.Lock()
+
+# persistent StridedTransformer worker and its config, set by syn_real_main
+pose_worker = None
+pose_estimator_config = None
+
+# persistent joints2smpl workers, SMPL_FIT_SERVICE_WORKERS of them, started by syn_real_main
+fitting_service = None
+
+# ==============================
+# PIPELINE STAGES - each stage takes the job dict of one video, batch stages the list of jobs
+# ==============================
+
+# worker count of each stage, the GPU heavy stages run one video at a time by default
+DEFAULT_STAGE_WORKERS = {
+    "caption": 1,
+    "text_to_motion": 1,
+    "pose_estimation": 1,
+    "optimisation": 4,
+    "render": 1,
+}
+
+def create_job(video_files, video_name):
 
     # Extract the folder name from the video file (e.g., "07" from "07.mp4")
     video_folder_name = video_name.replace(".mp4", "")
@@ -39,154 +66,296 @@ def auto_npy_generation(video_files, video_name, StridedTransformer_path, text_t
     print(f"folder path name is called: {folder_path} ")
     
     os.makedirs(folder_path, exist_ok=True)  # ✅ Ensure the folder exists
-    
-    # checking if real_path_npz exists, if it does, skip to genereation of video
-    npz_found = folder_path + "output_keypoints_3d.npz"
-
-    if not os.path.exists(npz_found):
-
-        # ==============================
-        # 1️⃣ EXTRACT VIDEO DESCRIPTION (ChatGPT)
-        # ==============================
-
-        model_name = "ChatGPT"  # Model used for video description
-        api_key = env_vars.get("GPT_APIKEY") # OpenAI API Key
-        additional_info = ["Describe the person in the video"]  # Instruction for ChatGPT
-
-        # try statemtent in case video has error
-        try:
-            # Generate textual description of the video
-            results = process_videos(video_files, model_name, api_key, *additional_info)
-            
-        except Exception as e:
-            print(f"Error processing videos: {e}")
-            
-            # default description if the generated text from chatgpt doesntwork, can be keyed in videos_processing/models.py file
+
+    # stages whose inputs and parameters did not change since the last run are skipped,
+    # restoring the job entries they recorded
+    return {
+        "video_files": video_files,
+        "video_name": video_name,
+        "video_folder_name": video_folder_name,
+        "folder_path": folder_path,
+        "fingerprints": StageFingerprints(folder_path),
+        "transfer_stats": TransferStats(),
+
+        # every weight is fitted from its closest weight already fitted
+        "warm_starts": WarmStarts(weights_A),
+    }
+
+def stage_is_current(job, stage, fingerprint):
+    """
+    Skip a stage that already ran with this fingerprint, restoring its outputs into the job.
+    Otherwise forget its previous run, it is about to be re-executed.
+    """
+    if job["fingerprints"].is_current(stage, fingerprint):
+        job.update(job["fingerprints"].outputs(stage))
+        print(f"Log: Skipping {stage} for {job['video_name']}, its inputs did not change")
+        return True
+
+    job["fingerprints"].invalidate(stage)
+    return False
+
+def caption_stage(jobs):
+
+    # ==============================
+    # 1️⃣ EXTRACT VIDEO DESCRIPTION (ChatGPT)
+    # ==============================
+
+    # resolution and JPEG quality of the frames sent, trading caption fidelity for request size
+    max_size = int(env_vars.get("CAPTION_FRAME_MAX_SIZE") or FRAME_MAX_SIZE)
+    quality = int(env_vars.get("CAPTION_JPEG_QUALITY") or FRAME_JPEG_QUALITY)
+    config = caption_config(max_size=max_size, quality=quality)
+
+    # batch stage: the videos are captioned concurrently, at most CAPTION_MAX_IN_FLIGHT requests at a time
+    fingerprints = {}
+    for job in jobs:
+        fingerprint = stage_fingerprint([job["video_files"][0]], config)
+        if not stage_is_current(job, "caption", fingerprint):
+            fingerprints[str(job["video_files"][0])] = fingerprint
+
+    jobs = {str(job["video_files"][0]): job for job in jobs if str(job["video_files"][0]) in fingerprints}
+
+    if not jobs:
+        return
+
+    def save_caption(video_path, results, error):
+        job = jobs[video_path]
+
+        # default description if the generated text from chatgpt doesntwork, can be keyed in videos_processing/models.py file
+        if results is None:
+            print(f"Error processing videos: {error}")
             results = action_class
-            
+
         print(f"Log: Response from ChatGPT - {results}")
 
         # Save the generated text description into a text file
-        text_file_path = os.path.join(folder_path, "input.txt")
-        with open(text_file_path, "w", encoding="utf-8") as file:
-            file.write(results) 
+        job["text_file_path"] = os.path.join(job["folder_path"], "input.txt")
+        with open(job["text_file_path"], "w", encoding="utf-8") as file:
+            file.write(results)
 
-        print(f"Log: Saving response as a text file and copying to text-to-motion repo")
+        print(f"Log: Saving response as a text file")
 
-        # ==============================
-        # 2️⃣ GENERATE SYNTHETIC-MOTION DATA (Text-to-Motion)
-        # ==============================
+        # the default description is not recorded, so the video is captioned again on the next run
+        if results != action_class:
+            job["fingerprints"].record("caption", fingerprints[video_path], {"text_file_path": job["text_file_path"]})
 
-        # Copy the generated input text to the text-to-motion repository
-        destination = text_to_motion_path + "/input.txt"
-        shutil.copy(text_file_path, destination)  
+    # captions of unchanged videos are reused from earlier runs
+    caption_cache = CaptionCache(caption_cache_path or output_directory / ".caption_cache", config)
 
-        # Define and execute the command for motion generation
-        text_to_motion_path = Path(text_to_motion_path)
+    try:
+        caption_videos(list(jobs), env_vars.get("GPT_APIKEY"), on_result=save_caption,
+                       max_in_flight=int(env_vars.get("CAPTION_MAX_IN_FLIGHT") or 8),
+                       base_url=env_vars.get("CAPTION_BASE_URL"), cache=caption_cache,
+                       max_size=max_size, quality=quality)
+    finally:
+        caption_cache.close()
 
-        print("Log: Running text-to-motion repo")
+def text_to_motion_stage(jobs):
 
-        command = [
-            "python", "gen_motion_script.py",
-            "--name", "Comp_v6_KLD01",
-            "--text_file", "input.txt",
-            "--repeat_time", "1",
-            "--result_path", f"{str(output_directory.resolve())}/{video_folder_name}/"
-        ]
+    # ==============================
+    # 2️⃣ GENERATE SYNTHETIC-MOTION DATA (Text-to-Motion)
+    # ==============================
 
-        # Run the script inside the text-to-motion repo
-        subprocess.run(command, cwd=text_to_motion_path)
+    # batch stage: the captions of all the videos are generated in one text-to-motion run,
+    # so the model is loaded once for the dataset
+    fingerprints = {}
+    for job in jobs:
+        fingerprint = stage_fingerprint([job["text_file_path"]], {"model": "Comp_v6_KLD01"})
+        if not stage_is_current(job, "text_to_motion", fingerprint):
+            fingerprints[job["video_name"]] = fingerprint
 
-        print("Log: text-to-motion repo completed, retrieving synthetic_path")
+    jobs = [job for job in jobs if job["video_name"] in fingerprints]
 
-        # Finding the generation .npy file from text-to-motion
-        synthetic_folder_path = folder_path + "t2m/Comp_v6_KLD01/default/animations/C000/"
-        
-        dir_synthetic_folder_path = Path(synthetic_folder_path)
-        npy_files = sorted(dir_synthetic_folder_path.glob("*.npy"))
+    if not jobs:
+        return
 
-        if not npy_files:
-            raise FileNotFoundError(f"🚨 ERROR: No .npy file found in {synthetic_folder_path}")
+    captions = []
+    for job in jobs:
+        with open(job["text_file_path"], "r", encoding="utf-8") as file:
+            captions.append(file.read())
 
-        synthetic_path_name = npy_files[-1].name if npy_files else None
-        
-        # important path to feed into main_synth_real_function
-        synthetic_path = synthetic_folder_path + synthetic_path_name
+    batch_name = jobs[0]["video_folder_name"] if len(jobs) == 1 else "batch"
+    synthetic_paths = generate_motions_batch(captions, text_to_motion_path, output_directory / f"t2m_{batch_name}", batch_name)
 
-        # copying that file to the current folder
-        final_synthetic_path = folder_path + synthetic_path_name
-        shutil.copy(synthetic_path, final_synthetic_path)
+    # linking the generation of each video into its folder
+    for job, synthetic_path in zip(jobs, synthetic_paths):
+        if synthetic_path is None:
+            continue
 
-        # ==============================
-        # 3️⃣ GENERATE TRACKED-MOTION DATA (Strided Transformer) 
-        # ==============================
-        
-        # Define the path to StridedTransformer-Pose3D
-        StridedTransformer_path = Path(StridedTransformer_path)
+        job["final_synthetic_path"] = job["folder_path"] + synthetic_path.name
+        link_or_copy(synthetic_path, job["final_synthetic_path"], stats=job["transfer_stats"])
 
-        # Copy the video file to StridedTransformer for processing
-        destination = StridedTransformer_path / "demo/video" / video_name
-        shutil.copy(video_files[0], destination)
+        job["fingerprints"].record("text_to_motion", fingerprints[job["video_name"]], {"final_synthetic_path": job["final_synthetic_path"]})
 
-        print("Log: Video copied to StridedTransformer, running it!")
+def pose_estimation_stage(job):
 
-        # Run the StridedTransformer script for 3D pose estimation
-        subprocess.run(["python", "demo/vis.py", "--video", video_name], cwd=StridedTransformer_path)
+    # ==============================
+    # 3️⃣ GENERATE TRACKED-MOTION DATA (Strided Transformer) 
+    # ==============================
 
-        print("Log: StridedTransformer processing completed")
+    fingerprint = stage_fingerprint([job["video_files"][0]], pose_estimator_config or strided_transformer_config(StridedTransformer_path))
+    if stage_is_current(job, "pose_estimation", fingerprint):
+        return
 
-        # Retrieving generation .npz file from StridedTransformer Repo
-        copying_from = StridedTransformer_path / "demo/output" / video_folder_name / "output_3D/output_keypoints_3d.npz"
-        real_path_npz = folder_path + 'output_keypoints_3d.npz'
+    print("Log: Sending video to StridedTransformer, running it!")
 
-        if not copying_from.exists():
-            raise FileNotFoundError(f"🚨 ERROR: Generated NPZ file not found in {copying_from}")
-        
-        shutil.copy(copying_from, real_path_npz)
+    # Run the StridedTransformer pose estimation in the long-lived worker when syn_real_main started one
+    if pose_worker is not None:
+        copying_from = pose_worker.estimate(job["video_files"][0], job["video_name"])
+    else:
+        copying_from = run_strided_transformer(job["video_files"][0], job["video_name"], StridedTransformer_path)
 
-        print("Log: Copied generated NPZ file to dataset folder")
+    print("Log: StridedTransformer processing completed")
 
-        # ==============================
-        # 4️⃣  OPTIMIZE MOTION DATA
-        # ==============================
+    # Retrieving generation .npz file from StridedTransformer Repo, it is moved as the next run of the same video name overwrites it
+    job["real_path_npz"] = job["folder_path"] + 'output_keypoints_3d.npz'
+    move_or_copy(copying_from, job["real_path_npz"], stats=job["transfer_stats"])
 
-        print("Log: Running optimization with real and synthetic motion data")
+    print("Log: Moved generated NPZ file to dataset folder")
 
-        main_synth_real(real_path_npz, final_synthetic_path, folder_path)
+    job["fingerprints"].record("pose_estimation", fingerprint, {"real_path_npz": job["real_path_npz"]})
 
-        print("🎉 Motion optimization completed!")
+def optimisation_stage(job):
 
-    else:
+    # ==============================
+    # 4️⃣  OPTIMIZE MOTION DATA
+    # ==============================
+
+    if job.get("final_synthetic_path") is None:
+        raise FileNotFoundError(f"🚨 ERROR: text-to-motion generated no motion for {job['video_name']}")
+
+    fingerprint = stage_fingerprint([job["real_path_npz"], job["final_synthetic_path"]], {"alpha": alpha, "weights": weights_A})
+    if stage_is_current(job, "optimisation", fingerprint):
         print("Log: Skipping generation of synthetic data .npy files")
+        return
+
+    print("Log: Running optimization with real and synthetic motion data")
+
+    # the weights of this run are computed in one batch, others are generated on demand,
+    # the mapped, flipped and extended arrays stay in memory
+    main_synth_real(job["real_path_npz"], job["final_synthetic_path"], job["folder_path"], weights=weights_A, alpha=alpha, archive=True,
+                    save_intermediates=False)
+
+    print("🎉 Motion optimization completed!")
+
+    job["fingerprints"].record("optimisation", fingerprint, {"aligned_pair_path": job["folder_path"] + ALIGNED_PAIR_FILENAME,
+                                                             "variation_folder": job["folder_path"] + "all_variations"})
+
+def render_stage(job, weight_A):
+    try:
+        render_weight(job, weight_A)
+    finally:
+        # a variant that was skipped or failed has no fit to share, its neighbours start from the mean pose
+        job["warm_starts"].fitted(weight_A, None)
+
+def render_weight(job, weight_A):
 
     # ==============================
     # 5️⃣ Generating the video
     # ==============================
 
+    # one render stage per weight of the sweep, they run in parallel once the optimisation is done
+
+    folder_path = job["folder_path"]
+
     # all_variations_folder_path name
     variation_folder = folder_path + "all_variations"
 
     weight_B = round(1-weight_A,2)
     weights = (weight_A, weight_B)
 
-    npy_file_path = find_file_by_weights(variation_folder, weights)
-    
-    generated_video_path = npy_to_video(video_folder_name, npy_file_path)
+    # the variant is resolved by (weights, alpha) from the aligned pair and the archive, folders of older
+    # runs without an aligned pair only hold one .npy file per weight, written for an unknown alpha
+    aligned_pair_path = folder_path + ALIGNED_PAIR_FILENAME
+    has_aligned_pair = os.path.exists(aligned_pair_path)
+    legacy_npy_path = None if has_aligned_pair else find_file_by_weights(variation_folder, weights)
+
+    if not has_aligned_pair and legacy_npy_path is None:
+        raise FileNotFoundError(f"🚨 ERROR: No aligned pair or variant file for weights {weights} in {folder_path}")
+
+    # every weight is rendered to its own videos_generated folder, so it has its own fingerprint
+    # the fingerprint hashes the source the variant is resolved from, never a stale per-weight file,
+    # and the fit options and scripts the video is rendered with
+    stage = f"render_wA{weight_A}"
+    fingerprint = stage_fingerprint([aligned_pair_path if has_aligned_pair else legacy_npy_path], {"weights": weights, "alpha": alpha, **render_config()})
+    if stage_is_current(job, stage, fingerprint):
+        return
+
+    if has_aligned_pair:
+        # reading only the slice of the requested weights, generated for this alpha if it was not archived yet
+        pose_data = archived_variant(folder_path, weights, alpha, lock=variant_archive_lock)
+        npy_file_path = os.path.join(variation_folder, variant_filename(*normalise_weights(weights)))
+    else:
+        pose_data = None
+        npy_file_path = legacy_npy_path
+
+    # fitted from the closest weight already fitted, released to the next weights before the Blender render
+    warm_starts = job["warm_starts"]
+    generated_video_path = npy_to_video(job["video_folder_name"], npy_file_path, pose_data=pose_data, stats=job["transfer_stats"],
+                                        fitting_service=fitting_service, init_params=warm_starts.init_params(weight_A),
+                                        on_fitted=partial(warm_starts.fitted, weight_A))
 
     source_video = Path(generated_video_path)
-    destination_video = video_generated_path / source_video.name
-    shutil.copy(source_video, destination_video)
+    destination_video = video_generated_paths[weight_A] / source_video.name
+    link_or_copy(source_video, destination_video, stats=job["transfer_stats"])
 
     print(f"VIDEO GENERATING NOW!!!")
+    print(f"Log: Files handed over for {job['video_name']} - {job['transfer_stats'].summary()}")
+
+    job["fingerprints"].record(stage, fingerprint, {"generated_video_path": destination_video})
+
+# stage_workers overrides DEFAULT_STAGE_WORKERS, "render" sets the workers of the render stage of each weight
+def build_stage_graph(stage_workers=None):
+
+    workers = {**DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+
+    # captioning and pose estimation only need the video, so they overlap with each other
+    graph = StageGraph()
+    graph.add_stage("caption", caption_stage, workers=workers["caption"], batch=True)
+    graph.add_stage("text_to_motion", text_to_motion_stage, depends_on=["caption"], workers=workers["text_to_motion"], batch=True)
+    graph.add_stage("pose_estimation", pose_estimation_stage, workers=workers["pose_estimation"])
+    graph.add_stage("optimisation", optimisation_stage, depends_on=["text_to_motion", "pose_estimation"], workers=workers["optimisation"])
+
+    # the stages above run once per video, only the rendering fans out over the weights,
+    # each render stage waits for the fit of the weight it is warm-started from
+    for weight_A in WarmStarts(weights_A).order:
+        graph.add_stage(f"render_wA{weight_A}", partial(render_stage, weight_A=weight_A), depends_on=["optimisation"], workers=workers["render"])
+
+    return graph
+
+def auto_npy_generation(video_files, video_name):
+
+    """
+    Automates the process of generating .npy motion files from a video.
+    
+    Steps:
+    1. Extracts motion description using ChatGPT.
+    2. Generates text-based motion using the text-to-motion repository.
+    3. Processes motion through StridedTransformer-Pose3D.
+    4. Optimizes and combines motion data.
+
+    Runs the stages of a single video one after the other, syn_real_main overlaps them across videos.
+    The repositories are the STRIDED_TRANSFORMER and TEXT_TO_MOTION paths of the .env file, like in every stage.
+    """
+
+    job = create_job(video_files, video_name)
+
+    caption_stage([job])
+    text_to_motion_stage([job])
+    pose_estimation_stage(job)
+    optimisation_stage(job)
+    for weight_A in job["warm_starts"].order:
+        render_stage(job, weight_A)
 
 
 # ==============================
 # Main function to be used
 # ==============================
 
-def syn_real_main(weight_A_value, input_directory_path, output_directory_path):
+# weight_A_value is a w_A value or a list of them, every weight is rendered to its own videos_generated_<w_A> folder
+# stage_workers overrides DEFAULT_STAGE_WORKERS, e.g. {"optimisation": 8, "render": 4}
+def syn_real_main(weight_A_value, input_directory_path, output_directory_path, stage_workers=None):
 
-    global weight_A, video_generated_path, videos_path, video_directory, output_directory
+    global weights_A, video_generated_paths, videos_path, video_directory, output_directory, pose_worker, pose_estimator_config, fitting_service
 
     # Directory containing the MP4 video files to process (Rmbr to change)
     videos_path = input_directory_path
@@ -196,14 +365,15 @@ def syn_real_main(weight_A_value, input_directory_path, output_directory_path):
     # Folder where the original videos will be processed and the folders of each video will be created
     output_directory = Path(output_directory_path)
 
-    weight_A = weight_A_value # use the passed value from the function
+    weights_A = list(weight_A_value) if isinstance(weight_A_value, (list, tuple)) else [weight_A_value] # use the passed value from the function
 
-    # creating a folder called videos_generated
+    # creating a folder called videos_generated for each weight
     # Define original and generated video paths
-    video_generated_path = video_directory.parent / f"videos_generated_{weight_A}"  # Replace "videos" with "videos_generated"
+    video_generated_paths = {weight_A: video_directory.parent / f"videos_generated_{weight_A}" for weight_A in weights_A}  # Replace "videos" with "videos_generated"
 
-    # Create the folder if it doesn't exist
-    video_generated_path.mkdir(parents=True, exist_ok=True)
+    # Create the folders if they don't exist
+    for video_generated_path in video_generated_paths.values():
+        video_generated_path.mkdir(parents=True, exist_ok=True)
 
     # ==============================
     # PROCESS MULTIPLE VIDEOS
@@ -214,7 +384,8 @@ def syn_real_main(weight_A_value, input_directory_path, output_directory_path):
     
     print(f"Videos found in folder are {video_files}")
 
-    # Loop through each MP4 file and process it individually
+    # Prepare a job for each MP4 file
+    jobs = []
     for video_path in video_files:
         video_name = video_path.stem  # Extract filename without extension (e.g., "07" from "07.mp4")
 
@@ -224,17 +395,35 @@ def syn_real_main(weight_A_value, input_directory_path, output_directory_path):
 
         print(f"📂 Created folder: {video_folder}")
 
-        # Copy the video file into its dedicated folder
+        # Convert video name back to its original MP4 format for processing
         destination_video_path = video_folder / video_path.name
-        shutil.copy(video_path, destination_video_path)  # ✅ Copy the video to its processing folder
+        job = create_job([destination_video_path], video_name + ".mp4")
 
-        print(f"🎥 Copied video to: {destination_video_path}")
+        # Link the video file into its dedicated folder, copying only across filesystems
+        link_or_copy(video_path, destination_video_path, stats=job["transfer_stats"])  # ✅ Link the video to its processing folder
 
-        # Convert video name back to its original MP4 format for processing
-        video_name = video_name + ".mp4"
+        print(f"🎥 Linked video to: {destination_video_path}")
+
+        # The job only contains the video in its folder
+        jobs.append(job)
+
+    # Long-lived StridedTransformer process, the models are loaded once for all the videos
+    pose_worker = PoseEstimationWorker(StridedTransformerEstimator(StridedTransformer_path))
+    pose_estimator_config = strided_transformer_config(StridedTransformer_path)
+
+    # Long-lived joints2smpl processes, the SMPL models are loaded once for all the variants
+    fitting_service = SmplFittingService(num_workers=int(env_vars.get("SMPL_FIT_SERVICE_WORKERS") or 1))
+
+    # Start the full processing pipeline, the stages of different videos overlap
+    try:
+        failures = build_stage_graph(stage_workers).run(jobs)
+    finally:
+        pose_worker.close()
+        pose_worker = None
+        fitting_service.close()
+        fitting_service = None
 
-        # Update video_files list to contain only the copied video
-        video_files = [destination_video_path]
+    for job_index, (stage_name, _) in failures.items():
+        print(f"🚨 ERROR: {jobs[job_index]['video_name']} failed in stage '{stage_name}'")
 
-        # Start the full processing pipeline for this video
-        auto_npy_generation(video_files, video_name, StridedTransformer_path, text_to_motion_path)
+    print(f"Log: Files handed over in total - {transfer_stats.summary()}")
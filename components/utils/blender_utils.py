@@ -1,9 +1,17 @@
+from concurrent.futures import Future
 from pathlib import Path
+import importlib.util
 import shutil
 import os
 import re
+import math
 import subprocess
+import sys
+import numpy as np
 from dotenv import dotenv_values
+from utils.pose_cache import hash_file
+from utils.queue_worker import QueueWorkers, report_load_error, serve_jobs
+from utils.storage import link_or_copy
 
 
 env_vars = dotenv_values(".env")  
@@ -11,52 +19,248 @@ env_vars = dotenv_values(".env")
 join2smpl_path = env_vars.get("JOIN2SMPL")
 blender_path = env_vars.get("BLENDER")
 
+# batched fitting of fit_seq.py, SMPL_FIT_WINDOW frames per batch on SMPL_FIT_WORKERS cpu processes,
+# frame by frame fitting when SMPL_FIT_WINDOW is not set
+smpl_fit_window = env_vars.get("SMPL_FIT_WINDOW")
+smpl_fit_workers = env_vars.get("SMPL_FIT_WORKERS")
+
+# SMPL_OUTPUT_FORMAT=sequence writes one sequence.npz per variant instead of a ply and a pkl per frame,
+# the animation_pose.py copy in the blender folder must be recent enough to read it
+smpl_output_format = env_vars.get("SMPL_OUTPUT_FORMAT") or "frames"
+
+# SMPLify iterations per frame, SMPL_WARM_START_ITERS for variants initialised from a fitted neighbour
+smpl_fit_iters = env_vars.get("SMPL_FIT_ITERS") or "1"
+smpl_warm_start_iters = env_vars.get("SMPL_WARM_START_ITERS") or smpl_fit_iters
+
+def fit_seq_options():
+    """
+    fit_seq.py options shared by every variant, besides the file and the save folder.
+    """
+    # changing the iterations here 
+    options = ["--num_smplify_iters", smpl_fit_iters, "--output_format", smpl_output_format]
+
+    # fit_seq.py only uses them once the --init_params of a variant are loaded
+    options += ["--init_params_iters", smpl_warm_start_iters]
+
+    if smpl_fit_window:
+        options += ["--window", smpl_fit_window, "--num_workers", smpl_fit_workers or "1"]
+
+    return options
+
+def render_config():
+    """
+    Render config used in the render fingerprints, changes with the fit options or whenever fit_seq.py
+    or animation_pose.py is modified.
+    """
+    script_hashes = {}
+    for folder, name in ((join2smpl_path, "fit_seq.py"), (blender_path, "animation_pose.py")):
+        path = Path(folder) / name if folder else None
+        script_hashes[name] = hash_file(path) if path is not None and path.exists() else None
+
+    return {"fit_seq_options": fit_seq_options(), "script_sha256": script_hashes}
+
+# ==============================
+# Warm starts across the variants of a weight sweep
+# ==============================
+
+# The variants of one video at neighbouring weights differ slightly, so a variant is fitted
+# from the fit of its closest neighbour (fit_seq.py --init_params) with SMPL_WARM_START_ITERS
+# iterations. The sweep is fitted from its middle weight outwards:
+#
+#   weights 0.3 0.4 0.5 0.6 0.7  ->  0.5 from the mean pose, 0.4 and 0.6 from 0.5, 0.3 from 0.4, 0.7 from 0.6
+#
+# so the two halves are fitted in parallel and every variant starts from an adjacent weight.
+
+def warm_start_sources(weights):
+    """
+    Map every weight to the weight it is warm-started from (None for the first one), in fitting order.
+    """
+    ordered = sorted(set(weights))
+    if not ordered:
+        return {}
+
+    middle = (len(ordered) - 1) // 2
+    sources = {ordered[middle]: None}
+
+    # alternating between the halves, closest to the middle first
+    for step in range(1, len(ordered)):
+        if middle - step >= 0:
+            sources[ordered[middle - step]] = ordered[middle - step + 1]
+        if middle + step < len(ordered):
+            sources[ordered[middle + step]] = ordered[middle + step - 1]
+
+    return sources
+
+class WarmStarts:
+    """
+    The fitted results folders of the variants of one video, shared by the threads rendering them.
+
+    Args:
+        weights (list): w_A values of the sweep.
+    """
+
+    def __init__(self, weights):
+        self.sources = warm_start_sources(weights)
+        self._fitted = {weight: Future() for weight in self.sources}
+
+    @property
+    def order(self):
+        # a variant always comes after the variant it is warm-started from
+        return list(self.sources)
+
+    def init_params(self, weight):
+        """
+        Wait for the neighbour of weight to be fitted and return its results folder, None for a cold start.
+        """
+        source = self.sources.get(weight)
+        return self._fitted[source].result() if source is not None else None
+
+    def fitted(self, weight, folder):
+        """
+        Record the results folder of weight (None when it was not fitted), releasing the variants waiting on it.
+        """
+        future = self._fitted[weight]
+        if not future.done():
+            future.set_result(folder)
+
+# ==============================
+# Persistent SMPL fitting workers
+# ==============================
+
+# Starting `python fit_seq.py` for every variant re-imports torch/smplx, rebuilds the SMPL model
+# and SMPLify3D and reads the mean pose before fitting a single frame. SmplFittingService starts
+# worker processes that import fit_seq.py from the joints2smpl repo once, keep a FittingSession,
+# and fit the sequences sent to them over a shared queue, one sequence per worker at a time:
+#
+#   service = SmplFittingService(num_workers=2)
+#   npy_to_video(video_name, npy_file, fitting_service=service)
+#   service.close()
+
+def _fitting_worker_loop(join2smpl_path, options, job_queue, result_queue):
+    try:
+        # fit_seq.py uses paths relative to the repo root
+        join2smpl_path = os.path.abspath(join2smpl_path)
+        os.chdir(join2smpl_path)
+        sys.path.insert(0, join2smpl_path)
+
+        spec = importlib.util.spec_from_file_location("fit_seq", os.path.join(join2smpl_path, "fit_seq.py"))
+        fit_seq = importlib.util.module_from_spec(spec)
+        # registered under its name so the window workers of fit_seq.py can import it
+        sys.modules["fit_seq"] = fit_seq
+        spec.loader.exec_module(fit_seq)
+
+        session = fit_seq.FittingSession(fit_seq.parser.parse_args(options))
+
+    # argparse exits on invalid options
+    except (Exception, SystemExit) as e:
+        report_load_error(result_queue, e)
+        return
+
+    try:
+        serve_jobs(lambda file_name, file_options: session.fit_file(file_name, **file_options), job_queue, result_queue)
+    finally:
+        # stops the window workers kept by the session across sequences
+        session.close()
+
+class SmplFittingService(QueueWorkers):
+    """
+    Long-lived fit_seq.py processes fitting the .npy sequences submitted to them.
+
+    Args:
+        num_workers (int): Independent worker processes, each loads the models once.
+        options (list, optional): fit_seq.py command line options of every sequence, fit_seq_options() by default.
+    """
+
+    name = "SMPL fitting service"
+    task = "SMPL fitting"
+
+    def __init__(self, num_workers=1, options=None):
+        # not daemonic, fit_seq.py --num_workers starts processes of its own
+        super().__init__(_fitting_worker_loop, args=(join2smpl_path, options or fit_seq_options()),
+                         num_workers=num_workers, daemon=False)
+
+    def submit(self, file_name, **file_options):
+        """
+        Queue a file of the demo_data folder and return a Future resolving to its results folder.
+        file_options override fit_seq.py options for this file (e.g. save_folder).
+        """
+        return super().submit(file_name, file_options)
+
+    def fit(self, file_name, **file_options):
+        """
+        Fit a single file, blocking until a worker returns it.
+        """
+        return self.submit(file_name, **file_options).result()
+
 # ==============================
 # Converts npy to mp4 video
 # ==============================
 
-def npy_to_video(video_name, original_npy_file):
+# pose_data can hold the variant array (e.g. a slice of a VariantArchive), it is then
+# written straight to joints2smpl under the name of original_npy_file. Files handed over are
+# counted in stats (a TransferStats) when given. With a fitting_service (a SmplFittingService)
+# the sequence is fitted by its workers instead of a new fit_seq.py process. init_params is the
+# results folder of a neighbouring variant to warm-start from, on_fitted is called with the
+# results folder of this variant as soon as it is fitted, before the Blender render.
+
+def npy_to_video(video_name, original_npy_file, pose_data=None, stats=None, fitting_service=None,
+                 init_params=None, on_fitted=None):
 
     # ==============================
-    # 1️⃣ Convert .npy file to a folder of .obj files (joints2smpl)
+    # 1️⃣ Convert .npy file to a folder of .ply files or a sequence.npz (joints2smpl)
     # ==============================
 
-    # extracting the file name and duplicating to the joints2smpl folder
+    # extracting the file name and linking it into the joints2smpl folder
     filename = Path(original_npy_file).name
     join2smpl_npy_path = join2smpl_path + "/demo/demo_data/" + video_name + filename
 
-    shutil.copy(original_npy_file, join2smpl_npy_path)
-
-    # running the command for joints2smpl
-    command = [
-        "python", "fit_seq.py",
-        "--files", video_name + filename,
-
-        # changing the iterations here 
-        "--num_smplify_iters", "1"
-    ]
-
-    # Run the script inside the text-to-motion repo
-    subprocess.run(command, cwd=join2smpl_path)
+    if pose_data is not None:
+        # the path may still be a link to a dataset file from an earlier run, it must not be written through
+        Path(join2smpl_npy_path).unlink(missing_ok=True)
+        np.save(join2smpl_npy_path, pose_data)
+    else:
+        link_or_copy(original_npy_file, join2smpl_npy_path, stats=stats)
 
     # blender scripts
 
-    filename = Path(original_npy_file).name
-    # duplicate the folder from output of the joints2smp to the blender test folder
-
     foldername = filename.replace(".npy","")
 
-    join2smpl_output_path = join2smpl_path + "/demo/demo_results/" + video_name + foldername
+    # joints2smpl writes its output straight into the blender renders folder
     render_blender_path = blender_path + "/renders/" + video_name + foldername
 
     # Ensure the destination path exists, or deleting if it already exists
     if os.path.exists(render_blender_path):
         shutil.rmtree(render_blender_path)  # Remove existing folder
 
-    shutil.copytree(join2smpl_output_path, render_blender_path)
+    # a warm-started variant starts from its neighbour's fit and needs fewer iterations (--init_params_iters)
+    warm_start_options = {}
+    if init_params is not None:
+        warm_start_options = {"init_params": os.path.abspath(init_params)}
+
+    # a failed fit raises here, so its folder is never published as a warm start or rendered
+    if fitting_service is not None:
+        fitting_service.fit(video_name + filename, save_folder=os.path.abspath(blender_path + "/renders/"), **warm_start_options)
+    else:
+        # running the command for joints2smpl
+        command = [
+            "python", "fit_seq.py",
+            "--files", video_name + filename,
+            "--save_folder", os.path.abspath(blender_path + "/renders/"),
+        ] + fit_seq_options()
+
+        for option, value in warm_start_options.items():
+            command += [f"--{option}", str(value)]
+
+        # Run the script inside the joints2smpl repo
+        result = subprocess.run(command, cwd=join2smpl_path)
+        if result.returncode != 0:
+            raise RuntimeError(f"🚨 ERROR: SMPL fitting failed - fit_seq.py exited with code {result.returncode}")
+
+    if on_fitted is not None:
+        on_fitted(render_blender_path)
 
     # ==============================
-    # 2️⃣ Generate .mp4 video from .obj files (Blender)
+    # 2️⃣ Generate .mp4 video from the fitted meshes (Blender)
     # ==============================
 
     # Running the command for blender (Blender 3.0.1)
@@ -96,7 +300,7 @@ def find_file_by_weights(folder_path, weights):
         if match:
             file_weight_A = float(match.group(1))
             file_weight_B = float(match.group(2))
-            # Directly compare extracted weights with the input weights.
-            if file_weight_A == weights[0] and file_weight_B == weights[1]:
+            # Compare extracted weights with the input weights, allowing for float rounding.
+            if math.isclose(file_weight_A, weights[0], abs_tol=1e-6) and math.isclose(file_weight_B, weights[1], abs_tol=1e-6):
                 return os.path.join(folder_path, filename)
     return None
\ No newline at end of file
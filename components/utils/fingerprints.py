@@ -0,0 +1,124 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+from .pose_cache import hash_file
+
+# ==============================
+# Stage fingerprints for incremental runs
+# ==============================
+
+# Every stage records a fingerprint of its inputs (file contents) and parameters next to its
+# outputs, in <folder>/.fingerprints.json:
+#
+#   {"pose_estimation": {"fingerprint": "...", "outputs": {"real_path_npz": ".../output_keypoints_3d.npz"}}, ...}
+#
+# A stage is skipped only when its fingerprint is unchanged and all its recorded outputs still
+# exist, so a crashed run resumes at the first unfinished stage and a new alpha, weight or
+# estimator version re-runs the stages it affects. A stage that re-runs changes the content of
+# its outputs, which changes the fingerprints of the stages reading them.
+
+FINGERPRINTS_FILENAME = ".fingerprints.json"
+
+# content hashes of this process, keyed by (path, size, mtime) so an unchanged file is only read once
+_content_hashes = {}
+_content_hashes_lock = threading.Lock()
+
+def content_hash(path):
+    """
+    sha256 of a file, or of the names and contents of all the files in a folder.
+    """
+    path = Path(path)
+
+    if path.is_dir():
+        digest = hashlib.sha256()
+        for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(str(file_path.relative_to(path)).encode("utf-8"))
+            digest.update(content_hash(file_path).encode("utf-8"))
+        return digest.hexdigest()
+
+    stat = os.stat(path)
+    stat_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+    with _content_hashes_lock:
+        cached = _content_hashes.get(stat_key)
+    if cached is None:
+        cached = hash_file(path)
+        with _content_hashes_lock:
+            _content_hashes[stat_key] = cached
+
+    return cached
+
+def stage_fingerprint(inputs=(), params=None):
+    """
+    Fingerprint of a stage run from its input files and its parameters (anything json serialisable).
+    """
+    description = {
+        "inputs": [content_hash(path) for path in inputs],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class StageFingerprints:
+    """
+    The fingerprints and outputs of the stages run in one output folder.
+
+    Args:
+        folder (str | Path): Output folder of the item (e.g. a video), the fingerprints are stored in it.
+    """
+
+    def __init__(self, folder):
+        self.path = Path(folder) / FINGERPRINTS_FILENAME
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, entries):
+        # writing under a temporary name first so an interrupted write never loses the other stages
+        temp_path = self.path.with_suffix(".json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(entries, file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def is_current(self, stage, fingerprint):
+        """
+        True when the stage already ran with this fingerprint and its outputs still exist.
+        """
+        with self._lock:
+            entry = self._load().get(stage)
+
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return False
+
+        return all(os.path.exists(path) for path in entry["outputs"].values())
+
+    def outputs(self, stage):
+        """
+        The outputs recorded by the last run of the stage.
+        """
+        with self._lock:
+            return self._load().get(stage, {}).get("outputs", {})
+
+    def record(self, stage, fingerprint, outputs):
+        """
+        Record a finished stage, outputs maps names to the paths it wrote.
+        """
+        with self._lock:
+            entries = self._load()
+            entries[stage] = {"fingerprint": fingerprint, "outputs": {name: str(path) for name, path in outputs.items()}}
+            self._save(entries)
+
+    def invalidate(self, stage):
+        """
+        Forget a stage before re-running it, so outputs left by an interrupted run are never reused.
+        """
+        with self._lock:
+            entries = self._load()
+            if entries.pop(stage, None) is not None:
+                self._save(entries)
@@ -0,0 +1,132 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import subprocess
+from .storage import link_or_copy, move_or_copy
+
+# ==============================
+# Content-addressed cache of StridedTransformer pose estimations
+# ==============================
+
+# a video is estimated once per (video content, estimator config), every later request
+# for the same video (e.g. each real2real pair it appears in) reuses the cached .npz
+#
+# <cache_directory>/<key>/output_keypoints_3d.npz
+# <cache_directory>/<key>/info.json
+
+POSE_NPZ_FILENAME = "output_keypoints_3d.npz"
+
+def hash_file(file_path, chunk_size=1 << 20):
+    """
+    Return the sha256 hex digest of a file's content, read in chunks.
+    """
+    digest = hashlib.sha256()
+
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def strided_transformer_config(StridedTransformer_path):
+    """
+    Estimator config used in the cache key, changes whenever demo/vis.py is modified.
+    """
+    vis_script = Path(StridedTransformer_path) / "demo/vis.py"
+    script_hash = hash_file(vis_script) if vis_script.exists() else None
+
+    return {"estimator": "StridedTransformer-Pose3D", "script": "demo/vis.py", "script_sha256": script_hash}
+
+def run_strided_transformer(video_path, video_name, StridedTransformer_path):
+    """
+    Run StridedTransformer demo/vis.py on a single video and return the path of the generated .npz.
+    video_name is the name the video is copied under in demo/video, its output folder drops ".mp4".
+    """
+    StridedTransformer_path = Path(StridedTransformer_path)
+
+    # Link the video file into StridedTransformer for processing, vis.py only reads it from demo/video
+    destination = StridedTransformer_path / "demo/video" / video_name
+    link_or_copy(video_path, destination, allow_symlink=True)
+
+    # Run the StridedTransformer script for 3D pose estimation
+    subprocess.run(["python", "demo/vis.py", "--video", video_name], cwd=StridedTransformer_path)
+
+    generated_npz = StridedTransformer_path / "demo/output" / video_name.replace(".mp4", "") / "output_3D" / POSE_NPZ_FILENAME
+
+    if not generated_npz.exists():
+        raise FileNotFoundError(f"🚨 ERROR: Generated NPZ file not found in {generated_npz}")
+
+    return generated_npz
+
+class PoseCache:
+    """
+    On-disk pose cache keyed by the sha256 of the video content and the estimator config.
+
+    Args:
+        cache_directory (str | Path): Folder holding the cached estimations.
+        estimator_config (dict): Anything that changes the estimator output (script version, checkpoints, ...).
+    """
+
+    def __init__(self, cache_directory, estimator_config):
+        self.cache_directory = Path(cache_directory)
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        self.estimator_config = estimator_config
+        self.config_json = json.dumps(estimator_config, sort_keys=True)
+
+        # video hashes of this run, keyed by (path, size, mtime) so a file is only read once
+        self._video_hashes = {}
+
+    def key(self, video_path):
+        stat = os.stat(video_path)
+        stat_key = (str(Path(video_path).resolve()), stat.st_size, stat.st_mtime_ns)
+
+        if stat_key not in self._video_hashes:
+            self._video_hashes[stat_key] = hash_file(video_path)
+
+        return hashlib.sha256((self._video_hashes[stat_key] + self.config_json).encode("utf-8")).hexdigest()
+
+    def get(self, video_path):
+        """
+        Return the cached .npz path for the video, or None when it has not been estimated yet.
+        """
+        cached_npz = self.cache_directory / self.key(video_path) / POSE_NPZ_FILENAME
+        return cached_npz if cached_npz.exists() else None
+
+    def put(self, video_path, npz_path):
+        """
+        Store an estimation of the video in the cache and return the cached path.
+        npz_path is moved into the cache, it is usually an estimator output overwritten by its next run.
+        """
+        entry_directory = self.cache_directory / self.key(video_path)
+        entry_directory.mkdir(parents=True, exist_ok=True)
+
+        # moving under a temporary name first so an interrupted copy is never picked up as a hit
+        cached_npz = entry_directory / POSE_NPZ_FILENAME
+        temp_npz = entry_directory / (POSE_NPZ_FILENAME + ".tmp")
+        move_or_copy(npz_path, temp_npz)
+        os.replace(temp_npz, cached_npz)
+
+        with open(entry_directory / "info.json", "w", encoding="utf-8") as file:
+            json.dump({"video": str(video_path), "config": self.estimator_config}, file, indent=2)
+
+        return cached_npz
+
+    def estimate(self, video_path, video_name, StridedTransformer_path, estimator=None):
+        """
+        Return the cached .npz of the video, running StridedTransformer only on a cache miss.
+        estimator(video_path, video_name) replaces the demo/vis.py subprocess, e.g. PoseEstimationWorker.estimate.
+        """
+        cached_npz = self.get(video_path)
+
+        if cached_npz is not None:
+            print(f"Log: Reusing cached pose estimation for {video_path}")
+            return cached_npz
+
+        print(f"Log: Running StridedTransformer on {video_path}")
+        if estimator is not None:
+            generated_npz = estimator(video_path, video_name)
+        else:
+            generated_npz = run_strided_transformer(video_path, video_name, StridedTransformer_path)
+
+        return self.put(video_path, generated_npz)
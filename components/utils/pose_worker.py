@@ -0,0 +1,154 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+import functools
+import importlib.util
+import os
+import sys
+import zlib
+import numpy as np
+from utils.queue_worker import QueueWorkers, report_load_error, serve_jobs
+
+# ==============================
+# Persistent pose-estimation worker
+# ==============================
+
+# Instead of starting `python demo/vis.py` for every video, a worker process loads the
+# estimator once and then handles a stream of videos sent over a queue:
+#
+#   worker = PoseEstimationWorker(StridedTransformerEstimator(StridedTransformer_path))
+#   npz_path = worker.estimate(video_path, video_name)
+#   worker.close()
+#
+# Any object with load() and estimate(video_path, video_name) can be used as the estimator,
+# StandInPoseEstimator runs the pipeline without the StridedTransformer repo.
+
+class PoseEstimator(ABC):
+    def load(self):
+        """
+        Load the models, called once inside the worker process.
+        """
+
+    @abstractmethod
+    def estimate(self, video_path, video_name):
+        """
+        Estimate the 3D pose of a video and return the path of its output_keypoints_3d.npz.
+        """
+
+class StridedTransformerEstimator(PoseEstimator):
+    """
+    Runs StridedTransformer-Pose3D demo/vis.py in-process.
+
+    vis.py is imported once, so the interpreter start-up, the torch/CUDA initialisation and the
+    imports of the detector, HRNet and transformer code are paid once per worker. With
+    cache_checkpoints the checkpoints read by torch.load are also kept in memory, so the models
+    that vis.py rebuilds for every video are filled from memory instead of disk.
+    """
+
+    def __init__(self, StridedTransformer_path, gpu="0", cache_checkpoints=True):
+        self.StridedTransformer_path = Path(StridedTransformer_path).resolve()
+        self.gpu = gpu
+        self.cache_checkpoints = cache_checkpoints
+        self.vis = None
+
+    def load(self):
+        os.environ["CUDA_VISIBLE_DEVICES"] = self.gpu
+
+        # vis.py uses paths relative to the repo root
+        os.chdir(self.StridedTransformer_path)
+        sys.path.insert(0, str(self.StridedTransformer_path))
+        sys.argv = [sys.argv[0]]
+
+        if self.cache_checkpoints:
+            import torch
+            torch_load = torch.load
+
+            @functools.lru_cache(maxsize=None)
+            def cached_load(path, map_location=None):
+                return torch_load(path, map_location=map_location)
+
+            def load(f, map_location=None, **kwargs):
+                if isinstance(f, (str, Path)) and not kwargs and (map_location is None or isinstance(map_location, str)):
+                    return cached_load(str(f), map_location)
+                return torch_load(f, map_location=map_location, **kwargs)
+
+            torch.load = load
+
+        spec = importlib.util.spec_from_file_location("strided_transformer_vis", self.StridedTransformer_path / "demo/vis.py")
+        self.vis = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.vis)
+
+    def estimate(self, video_path, video_name):
+
+        # get_pose2D/get_pose3D take the video path, so the video is read where it is instead of copied to demo/video
+        video_path = str(Path(video_path).resolve())
+        output_dir = f"./demo/output/{video_name.replace('.mp4', '')}/"
+
+        self.vis.get_pose2D(video_path, output_dir)
+        self.vis.get_pose3D(video_path, output_dir)
+
+        generated_npz = self.StridedTransformer_path / output_dir / "output_3D/output_keypoints_3d.npz"
+
+        if not generated_npz.exists():
+            raise FileNotFoundError(f"🚨 ERROR: Generated NPZ file not found in {generated_npz}")
+
+        return generated_npz
+
+class StandInPoseEstimator(PoseEstimator):
+    """
+    Writes a deterministic random-walk (frames, 17, 3) reconstruction, for testing without the real repo.
+    """
+
+    def __init__(self, output_directory, num_frames=100):
+        self.output_directory = Path(output_directory)
+        self.num_frames = num_frames
+
+    def estimate(self, video_path, video_name):
+        output_dir = self.output_directory / video_name.replace(".mp4", "") / "output_3D"
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        seed = zlib.crc32(Path(video_path).read_bytes()) if Path(video_path).exists() else 0
+        steps = np.random.default_rng(seed).normal(scale=0.01, size=(self.num_frames, 17, 3))
+
+        generated_npz = output_dir / "output_keypoints_3d.npz"
+        np.savez(generated_npz, reconstruction=np.cumsum(steps, axis=0).astype(np.float32))
+        return generated_npz
+
+def _worker_loop(estimator, return_arrays, job_queue, result_queue):
+    try:
+        estimator.load()
+    except Exception as e:
+        report_load_error(result_queue, e)
+        return
+
+    def estimate(video_path, video_name):
+        npz_path = estimator.estimate(video_path, video_name)
+        return np.load(npz_path)["reconstruction"] if return_arrays else str(npz_path)
+
+    serve_jobs(estimate, job_queue, result_queue)
+
+class PoseEstimationWorker(QueueWorkers):
+    """
+    A long-lived process running an estimator on the videos submitted to it.
+
+    Args:
+        estimator (PoseEstimator): Picklable estimator, loaded once inside the worker process.
+        return_arrays (bool): Return the (frames, 17, 3) reconstruction arrays instead of npz paths.
+    """
+
+    name = "pose estimation worker"
+    task = "Pose estimation"
+
+    def __init__(self, estimator, return_arrays=False):
+        super().__init__(_worker_loop, args=(estimator, return_arrays))
+
+    def submit(self, video_path, video_name):
+        """
+        Queue a video and return a Future resolving to its npz path (or array).
+        """
+        return super().submit(str(video_path), video_name)
+
+    def estimate(self, video_path, video_name):
+        """
+        Estimate a single video, blocking until the worker returns it.
+        """
+        return self.submit(video_path, video_name).result()
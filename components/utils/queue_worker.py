@@ -0,0 +1,133 @@
+from concurrent.futures import Future
+import itertools
+import multiprocessing
+import queue
+import threading
+
+# ==============================
+# Long-lived worker processes fed over a queue
+# ==============================
+
+# PoseEstimationWorker and SmplFittingService both load their models once in spawned processes
+# and then handle a stream of jobs. QueueWorkers holds what they share: the processes, the job
+# and result queues, a Future per submitted job resolved by a reader thread, and the shutdown.
+# A service supplies the target run by its processes and the payload of its jobs:
+#
+#   def _worker_loop(model_path, job_queue, result_queue):
+#       try:
+#           model = load(model_path)
+#       except Exception as e:
+#           report_load_error(result_queue, e)
+#           return
+#       serve_jobs(model.run, job_queue, result_queue)
+#
+#   workers = QueueWorkers(_worker_loop, args=(model_path,))
+#   result = workers.submit(input_path).result()
+
+def report_load_error(result_queue, error):
+    """
+    Report a worker that could not start, failing every pending job.
+    """
+    result_queue.put((None, None, f"{type(error).__name__}: {error}"))
+
+def serve_jobs(handle, job_queue, result_queue):
+    """
+    Call handle(*payload) on every job of job_queue until the None sent by close(), reporting its result or error.
+    """
+    for job_id, payload in iter(job_queue.get, None):
+        try:
+            result_queue.put((job_id, handle(*payload), None))
+        except Exception as e:
+            result_queue.put((job_id, None, f"{type(e).__name__}: {e}"))
+
+class QueueWorkers:
+    """
+    Long-lived processes handling the jobs submitted to them, one job per process at a time.
+
+    Args:
+        target (callable): Module level function run by every process as target(*args, job_queue, result_queue).
+        args (tuple): Picklable arguments of target.
+        num_workers (int): Processes sharing the job queue.
+        daemon (bool): Daemonic processes can't start processes of their own.
+    """
+
+    # used in the error messages, e.g. "🚨 ERROR: The pose estimation worker is not running"
+    name = "worker"
+    task = "Job"
+
+    def __init__(self, target, args=(), num_workers=1, daemon=True):
+        # spawn gives the workers a fresh interpreter, required for CUDA
+        context = multiprocessing.get_context("spawn")
+        self.job_queue = context.Queue()
+        self.result_queue = context.Queue()
+
+        self.processes = [context.Process(target=target, args=(*args, self.job_queue, self.result_queue), daemon=daemon)
+                          for _ in range(num_workers)]
+        for process in self.processes:
+            process.start()
+
+        self._job_ids = itertools.count()
+        self._pending = {}
+        self._load_error = None
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+
+    def submit(self, *payload):
+        """
+        Queue a job and return a Future resolving to its result.
+        """
+        future = Future()
+
+        with self._lock:
+            if self._load_error is not None or not all(process.is_alive() for process in self.processes):
+                raise RuntimeError(f"🚨 ERROR: The {self.name} is not running - {self._load_error}")
+            job_id = next(self._job_ids)
+            self._pending[job_id] = future
+
+        self.job_queue.put((job_id, payload))
+        return future
+
+    def close(self):
+        for _ in self.processes:
+            self.job_queue.put(None)
+        for process in self.processes:
+            process.join()
+        self.result_queue.put(None)
+        self._reader.join()
+
+    def _read_results(self):
+        while True:
+            try:
+                message = self.result_queue.get(timeout=1)
+            except queue.Empty:
+                # a worker died without reporting (e.g. killed or crashed in native code)
+                dead = [process for process in self.processes if not process.is_alive()]
+                if dead:
+                    message = (None, None, f"worker exited with code {dead[0].exitcode}")
+                else:
+                    continue
+
+            if message is None:
+                return
+
+            job_id, result, error = message
+            with self._lock:
+                # a failed load (or a dead worker) is reported without a job id and fails every pending job
+                futures = [self._pending.pop(job_id)] if job_id is not None else list(self._pending.values())
+                if job_id is None:
+                    self._pending.clear()
+                    # the first error is kept, a worker that failed to load is reported as dead afterwards
+                    self._load_error = self._load_error or error
+
+            for future in futures:
+                if error is not None:
+                    future.set_exception(RuntimeError(f"🚨 ERROR: {self.task} failed - {error}"))
+                else:
+                    future.set_result(result)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import traceback
+
+# ==============================
+# Stage graph scheduler
+# ==============================
+
+# Every item (e.g. a video) goes through the stages of the graph. A stage starts for an item
+# as soon as all the stages it depends on have finished for that item, so different items
+# can be in different stages at the same time. Each stage has its own worker pool, which
+# keeps GPU/CPU heavy stages limited while I/O bound stages (API calls, copies) run wider.
+#
+# Stages run on threads: the heavy lifting is done by subprocesses (text-to-motion,
+# StridedTransformer, joints2smpl, Blender), network calls or numpy.
+
+class Stage:
+    def __init__(self, name, function, depends_on=(), workers=1, batch=False):
+        self.name = name
+        self.function = function
+        self.depends_on = tuple(depends_on)
+        self.workers = workers
+        self.batch = batch
+
+class StageGraph:
+    """
+    A set of stages and the dependencies between them.
+
+    Stage functions are called with the item's job (any object, usually a dict shared by all
+    the stages of that item) and their return value is ignored. A batch stage is called once
+    with the list of all jobs that have not failed, after its dependencies finished for all of
+    them, e.g. to load a model once for the whole dataset.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add_stage(self, name, function, depends_on=(), workers=1, batch=False):
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+
+        self.stages[name] = Stage(name, function, depends_on, workers, batch)
+        return self
+
+    def run(self, jobs, stage_workers=None):
+        """
+        Run every job through the graph.
+
+        Args:
+            jobs (list): One job per item.
+            stage_workers (dict, optional): Worker count per stage name, overriding the stage default.
+
+        Returns:
+            dict: Maps the index of every failed job to (stage name, traceback). Stages depending on
+                  a failed stage are skipped for that job.
+        """
+        stage_workers = stage_workers or {}
+        executors = {name: ThreadPoolExecutor(max_workers=stage_workers.get(name, stage.workers), thread_name_prefix=name)
+                     for name, stage in self.stages.items()}
+
+        completed = [set() for _ in jobs]
+        started = [set() for _ in jobs]
+        failures = {}
+        running = {}
+
+        def submit_ready(job_index):
+            for name, stage in self.stages.items():
+                if stage.batch or name in started[job_index] or not set(stage.depends_on) <= completed[job_index]:
+                    continue
+                started[job_index].add(name)
+                future = executors[name].submit(stage.function, jobs[job_index])
+                running[future] = ([job_index], name)
+
+        def submit_ready_batches():
+            active = [job_index for job_index in range(len(jobs)) if job_index not in failures]
+
+            for name, stage in self.stages.items():
+                if not stage.batch or not active or any(name in started[job_index] for job_index in active):
+                    continue
+                if not all(set(stage.depends_on) <= completed[job_index] for job_index in active):
+                    continue
+                for job_index in active:
+                    started[job_index].add(name)
+                future = executors[name].submit(stage.function, [jobs[job_index] for job_index in active])
+                running[future] = (active, name)
+
+        try:
+            for job_index in range(len(jobs)):
+                submit_ready(job_index)
+            submit_ready_batches()
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    job_indices, name = running.pop(future)
+
+                    if future.exception() is not None:
+                        error = "".join(traceback.format_exception(future.exception()))
+                        print(f"🚨 ERROR: stage '{name}' failed for jobs {job_indices}\n{error}")
+                        for job_index in job_indices:
+                            failures[job_index] = (name, error)
+                        continue
+
+                    for job_index in job_indices:
+                        completed[job_index].add(name)
+                        if job_index not in failures:
+                            submit_ready(job_index)
+
+                # a failure can also make a batch stage ready, as it no longer waits for that job
+                submit_ready_batches()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        return failures
@@ -0,0 +1,116 @@
+from pathlib import Path
+import os
+import shutil
+import threading
+
+# ==============================
+# Zero-copy file handoff between the pipeline and the tool repositories
+# ==============================
+
+# Files handed to another repo (StridedTransformer, joints2smpl, Blender) or stored in the
+# dataset are hardlinked when source and destination are on the same filesystem, so the data is
+# written once. Symlinks are only used where asked for: they break when the source is removed
+# (e.g. the text-to-motion batch folder, which is cleared by the next batch). Copying is the
+# fallback, and every byte copied or linked is counted.
+#
+# A hardlink shares the file with its source, so only files that are never rewritten in place
+# are linked. Outputs a tool overwrites on its next run (e.g. the StridedTransformer .npz of a
+# video name) are moved out of the tool's folder with move_or_copy instead.
+#
+#   stats = TransferStats()
+#   link_or_copy(video_path, destination, stats=stats)
+#   print(stats.summary())
+
+class TransferStats:
+    """
+    Bytes and files linked or copied, safe to share between threads.
+    """
+
+    def __init__(self):
+        self.bytes_copied = 0
+        self.bytes_linked = 0
+        self.files_copied = 0
+        self.files_linked = 0
+        self._lock = threading.Lock()
+
+    def add(self, num_bytes, linked):
+        with self._lock:
+            if linked:
+                self.bytes_linked += num_bytes
+                self.files_linked += 1
+            else:
+                self.bytes_copied += num_bytes
+                self.files_copied += 1
+
+    def summary(self):
+        return (f"{self.bytes_copied / 2**20:.1f} MiB copied ({self.files_copied} files), "
+                f"{self.bytes_linked / 2**20:.1f} MiB linked ({self.files_linked} files)")
+
+# totals of the whole process
+transfer_stats = TransferStats()
+
+def link_or_copy(source, destination, allow_symlink=False, stats=None):
+    """
+    Make destination hold the content of source, hardlinking (or symlinking) instead of copying when possible.
+
+    Args:
+        source (str | Path): File to hand over.
+        destination (str | Path): Path it is expected at, replaced if it exists.
+        allow_symlink (bool): Symlink when a hardlink is not possible, only for sources that outlive the destination.
+        stats (TransferStats, optional): Also counted here, e.g. per video, besides transfer_stats.
+
+    Returns:
+        Path: destination
+    """
+    source, destination = Path(source), Path(destination)
+    num_bytes = source.stat().st_size
+
+    # already the same file, e.g. linked by an earlier run
+    if destination.exists() and os.path.samefile(source, destination):
+        linked = True
+    else:
+        if destination.is_symlink() or destination.exists():
+            destination.unlink()
+
+        try:
+            os.link(source, destination)
+            linked = True
+        except OSError:
+            linked = False
+
+        if not linked and allow_symlink:
+            try:
+                os.symlink(source.resolve(), destination)
+                linked = True
+            except OSError:
+                pass
+
+        if not linked:
+            shutil.copy(source, destination)
+
+    for counter in (transfer_stats, stats):
+        if counter is not None:
+            counter.add(num_bytes, linked)
+
+    return destination
+
+def move_or_copy(source, destination, stats=None):
+    """
+    Move source to destination, copying (and removing source) only across filesystems.
+    """
+    source, destination = Path(source), Path(destination)
+    num_bytes = source.stat().st_size
+
+    try:
+        os.replace(source, destination)
+        moved = True
+    except OSError:
+        shutil.copy(source, destination)
+        source.unlink()
+        moved = False
+
+    for counter in (transfer_stats, stats):
+        if counter is not None:
+            counter.add(num_bytes, moved)
+
+    return destination
@@ -0,0 +1,104 @@
+from collections import Counter
+from pathlib import Path
+import shutil
+import subprocess
+
+# ==============================
+# Batched text-to-motion generation
+# ==============================
+
+# gen_motion_script.py loads the Comp_v6_KLD01 checkpoint once per call and generates every
+# line of --text_file, --repeat_time samples each. Sending the captions of a whole dataset in
+# one file means the model is loaded once instead of once per video. --repeat_time applies to
+# every line, so the captions are grouped by how many videos share them and each group is one
+# run: a caption shared by many videos doesn't multiply the samples of all the others. A group
+# is written to
+#
+# <result_path>/repeat<n>/t2m/Comp_v6_KLD01/default/animations/C<caption index in the group>/gen_motion_<repeat>_L<length>_00_a.npy
+#
+# so the file of each video is found from its caption line and repeat index.
+
+ANIMATIONS_FOLDER = "t2m/Comp_v6_KLD01/default/animations"
+
+def caption_line(caption):
+    """
+    A caption as a single line of the text file, gen_motion_script.py reads one caption per line.
+    """
+    return " ".join(caption.split())
+
+def generate_motions_batch(captions, text_to_motion_path, result_directory, batch_name="batch"):
+    """
+    Generate one synthetic motion per caption with a single gen_motion_script.py run.
+
+    Identical captions are generated once with more repeats, so every video still gets its own sample.
+    Captions with the same number of repeats share a run, usually all of them are distinct and it is a single run.
+
+    Args:
+        captions (list): Caption of every video.
+        text_to_motion_path (str | Path): The text-to-motion repository.
+        result_directory (str | Path): Folder the generations are written to.
+        batch_name (str): Name of the caption file written in the text-to-motion repository.
+
+    Returns:
+        list: Path of the generated .npy file of every caption, in the order of captions, None
+              where nothing was generated so a single failed caption does not fail the batch.
+    """
+    lines = [caption_line(caption) for caption in captions]
+
+    # unique captions in order of appearance, and the repeat index of every video
+    unique_lines = list(dict.fromkeys(lines))
+    seen = Counter()
+    repeats = []
+    for line in lines:
+        repeats.append(seen[line])
+        seen[line] += 1
+
+    # captions of each repeat count, one run per count
+    groups = {}
+    for line in unique_lines:
+        groups.setdefault(seen[line], []).append(line)
+
+    result_directory = Path(result_directory).resolve()
+    result_directory.mkdir(parents=True, exist_ok=True)
+
+    caption_folders = {}
+    for repeat_time, group_lines in sorted(groups.items()):
+        group_directory = result_directory / f"repeat{repeat_time}"
+
+        text_file_name = f"input_{batch_name}_repeat{repeat_time}.txt"
+        with open(Path(text_to_motion_path) / text_file_name, "w", encoding="utf-8") as file:
+            file.write("\n".join(group_lines) + "\n")
+
+        # removing the generations of an earlier batch so they can't be mapped to these captions
+        shutil.rmtree(group_directory / ANIMATIONS_FOLDER, ignore_errors=True)
+        group_directory.mkdir(parents=True, exist_ok=True)
+
+        print(f"Log: Running text-to-motion repo on {len(group_lines)} captions, {repeat_time} samples each")
+
+        command = [
+            "python", "gen_motion_script.py",
+            "--name", "Comp_v6_KLD01",
+            "--text_file", text_file_name,
+            "--repeat_time", str(repeat_time),
+            "--result_path", f"{str(group_directory)}/"
+        ]
+
+        # Run the script inside the text-to-motion repo
+        subprocess.run(command, cwd=Path(text_to_motion_path))
+
+        for i, line in enumerate(group_lines):
+            caption_folders[line] = group_directory / ANIMATIONS_FOLDER / f"C{i:03d}"
+
+    print("Log: text-to-motion repo completed, retrieving synthetic paths")
+
+    synthetic_paths = []
+    for line, repeat in zip(lines, repeats):
+        caption_folder = caption_folders[line]
+        npy_files = sorted(caption_folder.glob(f"gen_motion_{repeat:02d}_L*_00_a.npy"))
+
+        if not npy_files:
+            print(f"🚨 ERROR: No .npy file found in {caption_folder} for repeat {repeat}")
+
+        synthetic_paths.append(npy_files[0] if npy_files else None)
+
+    return synthetic_paths
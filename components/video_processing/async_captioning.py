@@ -0,0 +1,200 @@
+import asyncio
+import random
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError
+from .models import (CAPTION_MODEL, CAPTION_PROMPT, CAPTION_PARAMETERS, FRAME_MAX_SIZE, FRAME_JPEG_QUALITY,
+                     action_class, caption_messages, encode_frames)
+from .utils import NUM_SAMPLED_FRAMES, describe_video
+
+# ==============================
+# Concurrent captioning of many videos
+# ==============================
+
+# process_videos captions one video per blocking request. AsyncCaptioningClient keeps up to
+# max_in_flight requests open at the same time, retries rate limits (429), server errors and
+# dropped connections with exponential backoff (or the server's retry-after), and yields the
+# captions as they complete:
+#
+#   client = AsyncCaptioningClient(api_key, max_in_flight=8, cache=CaptionCache(cache_directory, caption_config()))
+#   async for video_path, caption, error in client.caption_many(video_paths):
+#       ...
+#
+# base_url points the client at any OpenAI compatible server, e.g. a local stand-in for testing.
+
+def caption_config(model=CAPTION_MODEL, max_size=FRAME_MAX_SIZE, quality=FRAME_JPEG_QUALITY):
+    """
+    Everything that changes a caption besides the video, used in the CaptionCache key.
+    """
+    return {"model": model, "prompt": CAPTION_PROMPT, "parameters": CAPTION_PARAMETERS, "sampled_frames": NUM_SAMPLED_FRAMES,
+            "frame_max_size": max_size, "jpeg_quality": quality}
+
+# status codes worth retrying, anything else (bad request, authentication) fails straight away
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class AsyncCaptioningClient:
+    """
+    Caption videos concurrently with a chat completion model.
+
+    Args:
+        api_key (str): API key of the server.
+        max_in_flight (int): Maximum number of requests sent at the same time.
+        max_retries (int): Retries of a request after a rate limit or transient error.
+        base_delay (float): First backoff delay in seconds, doubled on every retry.
+        max_delay (float): Upper bound of a backoff delay in seconds.
+        base_url (str, optional): Server URL, defaults to the OpenAI API.
+        model (str): Chat completion model.
+        fallback (str, optional): Caption of a video that still fails after the retries, None raises instead.
+        cache (CaptionCache, optional): Captions reused across runs, only model captions are stored.
+        max_size (int, optional): Longest side of the frames sent, None keeps the source resolution.
+        quality (int): JPEG quality of the frames sent.
+    """
+
+    def __init__(self, api_key, max_in_flight=8, max_retries=5, base_delay=1.0, max_delay=30.0,
+                 base_url=None, model=CAPTION_MODEL, fallback=action_class, cache=None,
+                 max_size=FRAME_MAX_SIZE, quality=FRAME_JPEG_QUALITY):
+        # retries are handled here so they share the backoff and the in-flight limit
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.model = model
+        self.fallback = fallback
+        self.cache = cache
+        self.max_size = max_size
+        self.quality = quality
+        self._semaphore = None
+
+    def retry_delay(self, attempt, error):
+        """
+        Seconds to wait before the next attempt, the retry-after header of the response wins when present.
+        """
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+
+        try:
+            return min(float(retry_after), self.max_delay)
+        except (TypeError, ValueError):
+            # full jitter, so requests limited together don't all come back together
+            return random.uniform(0, min(self.base_delay * 2 ** attempt, self.max_delay))
+
+    async def request(self, base64_frames):
+        """
+        Send one captioning request, retrying rate limits and transient errors.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=caption_messages(base64_frames),
+                        **CAPTION_PARAMETERS
+                    )
+                return response.choices[0].message.content
+
+            # connection errors and timeouts have no status code and are always retried
+            except (APIConnectionError, APIStatusError) as e:
+                retryable = not isinstance(e, APIStatusError) or e.status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt == self.max_retries:
+                    raise
+
+                # waiting outside the semaphore so other videos can use the slot
+                delay = self.retry_delay(attempt, e)
+                print(f"Log: Captioning request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def caption(self, video_path):
+        """
+        Caption a single video, falling back to self.fallback when it can't be captioned.
+        """
+        try:
+            # hashing, frame decoding and JPEG encoding are blocking, they run on threads
+            if self.cache is not None:
+                caption = await asyncio.to_thread(self.cache.get, video_path)
+                if caption is not None:
+                    return caption
+
+            # frames are decoded at the size they are sent at
+            clip = await asyncio.to_thread(describe_video, str(video_path), max_size=self.max_size)
+            base64_frames = await asyncio.to_thread(encode_frames, clip, self.max_size, self.quality)
+            caption = await self.request(base64_frames)
+
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, caption, video_path)
+
+            return caption
+
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            print(f"Error processing video {video_path}: {e}")
+            return self.fallback
+
+    async def caption_many(self, video_paths):
+        """
+        Caption many videos concurrently, yielding (video_path, caption, error) in completion order.
+        """
+        async def caption_one(video_path):
+            try:
+                return video_path, await self.caption(video_path), None
+            except Exception as e:
+                return video_path, None, e
+
+        tasks = [asyncio.ensure_future(caption_one(video_path)) for video_path in video_paths]
+
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def close(self):
+        await self.client.close()
+
+def caption_videos(video_paths, api_key, on_result=None, **client_options):
+    """
+    Caption many videos concurrently from synchronous code.
+
+    Args:
+        video_paths (list): Videos to caption.
+        api_key (str): API key of the server.
+        on_result (callable, optional): Called with (video_path, caption, error) as each video completes.
+        **client_options: Passed to AsyncCaptioningClient.
+
+    Returns:
+        dict: Maps every video path to its caption, the fallback when the client can't be set up
+        (e.g. no API key), None for the videos that failed.
+    """
+    fallback = client_options.get("fallback", action_class)
+
+    async def run():
+        captions = {}
+
+        try:
+            client = AsyncCaptioningClient(api_key, **client_options)
+
+        # e.g. no API key, every video gets the fallback like a request that keeps failing
+        except Exception as e:
+            if fallback is None:
+                raise
+            print(f"Error setting up the captioning client: {e}")
+            for video_path in video_paths:
+                captions[video_path] = fallback
+                if on_result is not None:
+                    on_result(video_path, fallback, e)
+            return captions
+
+        try:
+            async for video_path, caption, error in client.caption_many(video_paths):
+                captions[video_path] = caption
+                if on_result is not None:
+                    on_result(video_path, caption, error)
+        finally:
+            await client.close()
+
+        return captions
+
+    return asyncio.run(run())
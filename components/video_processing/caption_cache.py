@@ -0,0 +1,128 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+from utils.pose_cache import hash_file
+
+# ==============================
+# Persistent caption cache
+# ==============================
+
+# a video is captioned once per (video content, captioning config), reruns of the pipeline
+# reuse the stored caption instead of sending the frames to the model again
+#
+# <cache_directory>/<key>.json   - caption, video and config of one entry
+# <cache_directory>/stats.json   - hits, misses and evictions over all runs
+#
+# entries are evicted least recently used first once there are more than max_entries,
+# and after max_age_days when it is set
+
+STATS_FILENAME = "stats.json"
+
+def hash_frames(clip):
+    """
+    Return the sha256 hex digest of sampled frames, for clips that don't come from a single file.
+    """
+    digest = hashlib.sha256(str(clip.shape).encode("utf-8"))
+    digest.update(clip.tobytes())
+    return digest.hexdigest()
+
+class CaptionCache:
+    """
+    On-disk caption cache keyed by the video content and everything that changes the caption.
+
+    Args:
+        cache_directory (str | Path): Folder holding the cached captions.
+        config (dict): Model name, prompt text, request parameters and frame sampling.
+        max_entries (int): Entries kept after evict(), least recently used are removed first.
+        max_age_days (float, optional): Entries not used for longer than this are removed by evict().
+    """
+
+    def __init__(self, cache_directory, config, max_entries=10000, max_age_days=None):
+        self.cache_directory = Path(cache_directory)
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        self.config = config
+        self.config_json = json.dumps(config, sort_keys=True)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, video_path=None, clip=None):
+        content_hash = hash_frames(clip) if clip is not None else hash_file(video_path)
+        return hashlib.sha256((content_hash + self.config_json).encode("utf-8")).hexdigest()
+
+    def get(self, video_path=None, clip=None):
+        """
+        Return the cached caption of the video (or sampled frames), or None on a miss.
+        """
+        entry_path = self.cache_directory / f"{self.key(video_path, clip)}.json"
+
+        try:
+            with open(entry_path, "r", encoding="utf-8") as file:
+                caption = json.load(file)["caption"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.misses += 1
+            return None
+
+        # the modification time tracks the last use for the LRU eviction
+        os.utime(entry_path)
+        self.hits += 1
+        return caption
+
+    def put(self, caption, video_path=None, clip=None):
+        entry_path = self.cache_directory / f"{self.key(video_path, clip)}.json"
+
+        # writing under a temporary name first so an interrupted write is never picked up as a hit
+        temp_path = entry_path.with_suffix(".json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"caption": caption, "video": str(video_path), "config": self.config}, file, indent=2)
+        os.replace(temp_path, entry_path)
+
+    def evict(self):
+        """
+        Remove the expired entries and the least recently used ones above max_entries.
+        """
+        entries = sorted((path.stat().st_mtime, path) for path in self.cache_directory.glob("*.json")
+                         if path.name != STATS_FILENAME)
+
+        expired = []
+        if self.max_age_days is not None:
+            oldest_allowed = time.time() - self.max_age_days * 86400
+            expired = [path for mtime, path in entries if mtime < oldest_allowed]
+
+        excess = [path for _, path in entries[:max(len(entries) - self.max_entries, 0)]]
+
+        for path in set(expired) | set(excess):
+            path.unlink(missing_ok=True)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        """
+        Evict, then add the statistics of this run to the totals in stats.json and return them.
+        """
+        self.evict()
+
+        stats_path = self.cache_directory / STATS_FILENAME
+        totals = {"hits": 0, "misses": 0, "evictions": 0}
+        if stats_path.exists():
+            with open(stats_path, "r", encoding="utf-8") as file:
+                totals.update(json.load(file))
+
+        run_stats = self.stats()
+        for name in ("hits", "misses", "evictions"):
+            totals[name] += run_stats[name]
+
+        with open(stats_path, "w", encoding="utf-8") as file:
+            json.dump(totals, file, indent=2)
+
+        print(f"Log: Caption cache - {run_stats['hits']} hits, {run_stats['misses']} misses, {run_stats['evictions']} evictions")
+        return run_stats
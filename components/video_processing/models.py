@@ -1,4 +1,5 @@
 from openai import OpenAI, OpenAIError
+from concurrent.futures import ThreadPoolExecutor
 import base64
 from PIL import Image
 import io
@@ -6,6 +7,72 @@ import io
 # action of the class
 action_class = 'a person is falling down'
 
+# chat completion settings of the captioning requests
+CAPTION_MODEL = "gpt-4o"
+CAPTION_PROMPT = f"Describe the action concisely in one sentence following this format: 'A man [verb]...'. If the action is unclear, default to {action_class}"
+CAPTION_PARAMETERS = {
+    "temperature": 1,
+    "max_tokens": 250,
+    "top_p": 1,
+    "frequency_penalty": 0,
+    "presence_penalty": 0,
+}
+
+# frame preparation, the longest side of a frame is scaled down to FRAME_MAX_SIZE (None keeps
+# the source resolution) before the JPEG encoding, smaller frames mean smaller, faster requests
+FRAME_MAX_SIZE = 1024
+FRAME_JPEG_QUALITY = 75
+FRAME_ENCODE_WORKERS = 4
+
+def encode_frame(frame, max_size=FRAME_MAX_SIZE, quality=FRAME_JPEG_QUALITY):
+    """
+    Encode a single RGB frame as a base64 JPEG string.
+    """
+    pil_image = Image.fromarray(frame)
+    if max_size is not None and max(pil_image.size) > max_size:
+        pil_image.thumbnail((max_size, max_size), Image.BILINEAR)
+
+    buffered = io.BytesIO()
+    pil_image.save(buffered, format="JPEG", quality=quality)
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+def encode_frames(clip, max_size=FRAME_MAX_SIZE, quality=FRAME_JPEG_QUALITY, workers=FRAME_ENCODE_WORKERS):
+    """
+    Encode the frames of a clip as base64 JPEG strings, on a thread pool (PIL releases the GIL while encoding).
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        base64_frames = list(executor.map(lambda frame: encode_frame(frame, max_size, quality), clip))
+
+    # the base64 strings are what is sent, report their size to tune max_size and quality
+    payload_bytes = sum(len(base64_frame) for base64_frame in base64_frames)
+    print(f"Log: Encoded {len(base64_frames)} frames, {payload_bytes / 1024:.1f} KiB payload")
+
+    return base64_frames
+
+def caption_messages(base64_frames):
+    """
+    Chat messages asking for a one sentence description of the action in the frames.
+    """
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": CAPTION_PROMPT
+                },
+                *[
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}"
+                        }
+                    } for base64_image in base64_frames
+                ]
+            ]
+        }
+    ]
+
 # Define the base strategy class
 class VideoModelStrategy:
     def initialise_model(self, api_key=None):
@@ -16,44 +83,18 @@ class VideoModelStrategy:
 
 # ChatGPT model inheriting from the base strategy
 class ChatGPT(VideoModelStrategy):
-    def initialise_model(self, api_key):
+    def initialise_model(self, api_key, max_size=FRAME_MAX_SIZE, quality=FRAME_JPEG_QUALITY):
         self.client = OpenAI(api_key=api_key)
+        self.max_size = max_size
+        self.quality = quality
 
     def inference(self, clip, additional_info):
-        base64_frames = []
-        for frame in clip:
-            pil_image = Image.fromarray(frame)
-            buffered = io.BytesIO()
-            pil_image.save(buffered, format="JPEG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-            base64_frames.append(img_str)
+        base64_frames = encode_frames(clip, self.max_size, self.quality)
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"Describe the action concisely in one sentence following this format: 'A man [verb]...'. If the action is unclear, default to {action_class}"
-                            },
-                            *[
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                } for base64_image in base64_frames
-                            ]
-                        ]
-                    }
-                ],
-                temperature=1,
-                max_tokens=250,
-                top_p=1,
-                frequency_penalty=0,
-                presence_penalty=0
+                model=CAPTION_MODEL,
+                messages=caption_messages(base64_frames),
+                **CAPTION_PARAMETERS
             )
             return response.choices[0].message.content
         except OpenAIError as e:
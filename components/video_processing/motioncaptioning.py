@@ -24,8 +24,8 @@ def process_videos(video_path: List[str], model_name: str, api_key: str, info: s
     # Initialize the model strategy
     model_strategy = get_model_strategy(model_name, api_key)
 
-    # Describe the video to extract frames
-    clip = describe_video(video_path)
+    # Describe the video to extract frames, decoded at the size the model strategy sends them at
+    clip = describe_video(video_path, max_size=getattr(model_strategy, "max_size", None))
 
     # Perform inference using the model strategy
     results = model_strategy.inference(clip, info)
@@ -1,49 +1,131 @@
 import av
 import numpy as np
 
-def describe_video(video_path: str) -> np.ndarray:
+# number of frames sampled from a video and sent to the model
+NUM_SAMPLED_FRAMES = 8
+
+# highest libavcodec lowres level (1/8 of the size). Decoders supporting it (MPEG-4 part 2, MJPEG,
+# MPEG-1/2, ...) then decode straight at the reduced size, the others (e.g. H.264, HEVC, VP9) ignore
+# it and decode at full size, their frames are only scaled during the RGB conversion
+MAX_LOWRES = 3
+
+def scaled_size(width: int, height: int, max_size: int = None) -> tuple:
     """
-    Extract frames from a video at specific intervals and return them as a stacked numpy array.
+    Frame size with the longest side at most max_size, keeping the aspect ratio and even dimensions.
+    """
+    if max_size is None or max(width, height) <= max_size:
+        return width, height
 
-    Args:
-    - video_path (str): Path to the video file.
+    scale = max_size / max(width, height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
 
-    Returns:
-    - np.ndarray: A numpy array containing the extracted frames.
+def lowres_level(width: int, height: int, max_size: int = None) -> int:
     """
-    # Open the video file
-    container = av.open(video_path)
-    
-    # Get the total number of frames in the video
-    total_frames = container.streams.video[0].frames
+    Largest lowres level (halving the size per level) keeping the longest side at least max_size.
+    """
+    level = 0
+    while max_size is not None and level < MAX_LOWRES and max(width, height) >> (level + 1) >= max_size:
+        level += 1
+    return level
+
+def _reduce_decoding(stream, max_size: int = None):
+    """
+    Ask the decoder of stream for frames at a reduced size when max_size allows it, before the first decode.
+    """
+    level = lowres_level(stream.width, stream.height, max_size)
+    if level:
+        stream.codec_context.options = {"lowres": str(level)}
+
+def _decode_near(container, stream, target_pts: int, exact: bool):
+    """
+    Seek to the keyframe at or before target_pts and decode up to the last frame at or before it.
+    With exact=False the keyframe itself is returned, skipping the decoding of the rest of the GOP.
+    """
+    container.seek(target_pts, stream=stream, backward=True, any_frame=False)
+
+    last_frame = None
+    for frame in container.decode(stream):
+        if last_frame is not None and frame.pts is not None and frame.pts > target_pts:
+            break
+        last_frame = frame
+        if not exact:
+            break
+
+    # past the last frame, the target is closest to the end of the video
+    return last_frame
+
+def _sample_sequential(video_path: str, num_frames: int, max_size: int = None) -> list:
+    """
+    Fallback for streams without a duration: count the packets without decoding them,
+    then decode once from the start keeping the frames at the sampled indices.
+    """
+    with av.open(video_path) as container:
+        total_frames = sum(1 for packet in container.demux(video=0) if packet.size > 0)
 
     # ✅ Prevent division by zero
     if total_frames == 0:
         raise ValueError(f"🚨 ERROR: The video '{video_path}' has zero frames. It may be empty or corrupted.")
-    
+
     # Calculate indices for extracting frames at intervals
-    indices = np.arange(0, total_frames, total_frames / 8).astype(int)
-    
-    # Initialize list to store extracted frames
+    indices = set(np.arange(0, total_frames, total_frames / num_frames).astype(int).tolist())
+    end_index = max(indices)
+
     frames = []
-    
-    # Seek to the beginning of the video
-    container.seek(0)
-    
-    # Define the range of frames to process
-    start_index = indices[0]
-    end_index = indices[-1]
-    
-    # Iterate over frames and extract the ones at the specified indices
-    for i, frame in enumerate(container.decode(video=0)):
-        if i > end_index:
-            break
-        if i >= start_index and i in indices:
-            frames.append(frame)
-    
-    # Convert extracted frames to numpy array format
-    clip = np.stack([x.to_ndarray(format="rgb24") for x in frames])
-    
+    with av.open(video_path) as container:
+        _reduce_decoding(container.streams.video[0], max_size)
+        for i, frame in enumerate(container.decode(video=0)):
+            if i > end_index:
+                break
+            if i in indices:
+                frames.append(frame)
+
+    return frames
+
+def describe_video(video_path: str, num_frames: int = NUM_SAMPLED_FRAMES, max_size: int = None, exact: bool = True) -> np.ndarray:
+    """
+    Extract frames from a video at specific intervals and return them as a stacked numpy array.
+
+    Seeks to the keyframe before each sampled timestamp and decodes only from there, instead of
+    decoding the whole video up to the last sampled frame.
+
+    Args:
+    - video_path (str): Path to the video file.
+    - num_frames (int): Number of frames sampled at regular intervals.
+    - max_size (int, optional): Longest side of the returned frames. Decoders with lowres support decode
+      at a reduced size already, other codecs are still decoded at full size and scaled while converting to RGB.
+    - exact (bool): Decode up to the sampled timestamps, False returns the keyframes before them.
+
+    Returns:
+    - np.ndarray: A numpy array containing the extracted frames.
+    """
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+
+        # the returned size comes from the full resolution, the same whether the decoder reduces it or not
+        size = scaled_size(stream.width, stream.height, max_size) if stream.width and stream.height else None
+        _reduce_decoding(stream, max_size)
+
+        # Duration in stream time_base units, from the container (microseconds) when the stream has none
+        duration = stream.duration
+        if duration is None and container.duration is not None:
+            duration = int(container.duration / av.time_base / stream.time_base)
+
+        if duration:
+            start = stream.start_time or 0
+            targets = [start + int(duration * i / num_frames) for i in range(num_frames)]
+            frames = [_decode_near(container, stream, target, exact) for target in targets]
+            frames = [frame for frame in frames if frame is not None]
+        else:
+            frames = None
+
+    if not frames:
+        frames = _sample_sequential(video_path, num_frames, max_size)
+
+    # Convert extracted frames to numpy array format, scaling during the colour conversion
+    width, height = size or scaled_size(frames[0].width, frames[0].height, max_size)
+    clip = np.stack([x.to_ndarray(format="rgb24", width=width, height=height) for x in frames])
+
     return clip
 
 from .models import ChatGPT